@@ -1,9 +1,11 @@
 from Functions.level_loop import Level_Loop
 from Functions.planet_loop import Planet_Loop
 from Functions.menus import Menus
+from Functions.sim_clock import Sim_Clock
 from threading import Thread
 from math import floor
 import pygame as py
+import sys
 
 
 class Main:
@@ -11,15 +13,16 @@ class Main:
     # Using slots will save up a lot of memory, depending on the amount of attributes.
     # Slots can be applied to this class because no new attributes will be added
     __slots__ = 'sc_width', 'sc_height', 'screen', 'clock', 'fps', 'run', 'planet', 'level', 'menus', 'initializing', \
-                'temp', 'temp2'
+                'temp', 'temp2', 'sim_clock'
 
-    def __init__(self):
-        """Mainloop variables"""
+    def __init__(self, uncapped=False):
+        """Mainloop variables, uncapped draws frames as fast as possible while the game still steps at fps"""
         py.init()
         self.sc_width, self.sc_height = 768, 480
         self.screen = py.display.set_mode((self.sc_width, self.sc_height))
         py.display.set_caption("Alien Adventure V1.1 (Copyright 2023, Ian Au)")
         self.clock, self.fps, self.run = py.time.Clock(), 60, True
+        self.sim_clock = Sim_Clock(self.clock, self.fps, uncapped=uncapped)
         self.planet = None
         self.level = None
         self.menus = None
@@ -59,6 +62,7 @@ class Main:
             self.level.init_database(database)
             self.planet.setup(self.menus.clicked)
             self.planet.editor.progress.hud_data['planet'] = database
+        self.planet.level_store = self.level.level.level_store
         self.level.hud.lives, self.level.player.lives = floor(self.planet.hud.lives), \
             round((self.planet.hud.lives - floor(self.planet.hud.lives)) * 10)
         self.level.hud.coins = self.planet.hud.coins
@@ -112,18 +116,21 @@ class Main:
             thread.start()
             self.setup_planet_cls()
             thread.join()
+            self.sim_clock.reset()
             self.menus.on_title = 'player'
         elif self.menus.on_title == 'load_p':
             thread = Thread(target=self.black_loading_from, args=(self.menus.player_select, self.menus.save_files))
             thread.start()
             self.setup_level_cls()
             thread.join()
+            self.sim_clock.reset()
             self.menus.on_title, self.menus.clicked = 'saves', False
         elif self.menus.on_title == 'load_s':
             thread = Thread(target=self.black_loading_from, args=(self.menus.save_files, self.planet.mainloop))
             thread.start()
             self.init_classes()
             thread.join()
+            self.sim_clock.reset()
             self.menus.on_title, self.menus.temp, self.menus.clicked = False, False, False
         elif self.menus.on_title == 'load_ps':
             thread = Thread(target=self.black_loading_from, args=(self.menus.player_select, self.planet.mainloop))
@@ -133,22 +140,32 @@ class Main:
             self.menus.clicked = 0
             self.init_classes()
             thread.join()
+            self.sim_clock.reset()
             self.menus.on_title, self.menus.temp, self.menus.clicked = False, False, False
 
     def mainloop(self):
-        """Mainloop for the game"""
+        """Mainloop for the game, the game runs in fixed steps and only the last step of a frame is drawn"""
         self.menus = Menus(self.screen)
         while self.run:
-            self.screen.fill((25, 25, 25))
-            if not self.menus.run and self.menus.on_title:
-                self.title_mainloop()
-            elif not self.menus.on_title:
-                self.r_mainloop()
+            steps = self.sim_clock.tick()
+            if not steps and self.in_level():
+                self.level.render(self.sim_clock.alpha)
+            for step in range(steps):
+                self.screen.fill((25, 25, 25))
+                if not self.menus.run and self.menus.on_title:
+                    self.title_mainloop()
+                elif not self.menus.on_title:
+                    self.r_mainloop(render=step == steps - 1)
 
-            self.update_pygame()
+            self.update_pygame(tick=False)
         self.check_quit_mainloop()
 
-    def r_mainloop(self):
+    def in_level(self):
+        """If a level is being played, frames in between its steps can be drawn on their own"""
+        return not self.menus.on_title and self.planet.state not in 'run pause_0 pause_9 cutscene' and \
+            self.level.state == 'run' and not self.level.editor.editor
+
+    def r_mainloop(self, render=True):
         """Mainloop for planet and level interactions"""
         if self.planet.state in 'run pause_0 pause_9 cutscene':
             if 'pause' in self.planet.state:
@@ -200,7 +217,7 @@ class Main:
                     self.level.state = 'run'
                     self.temp = True
             else:
-                self.level.mainloop()
+                self.level.mainloop(render=render)
                 self.temp = True
         elif self.planet.state == 'level' and self.level.state == 'map':
             # Loading from planet map to level
@@ -217,6 +234,7 @@ class Main:
                 self.menus.level_loading_screen(self.temp2)
             else:
                 self.level.state = 'run'
+                self.sim_clock.reset()
 
         elif self.level.state in 'exit green red' and self.planet.state == 'level':
             # Loading from level to planet map
@@ -259,6 +277,7 @@ class Main:
             else:
                 self.planet.return_to_map(self.level.state, self.level.current_level)
                 self.level.state = 'map'
+                self.sim_clock.reset()
                 self.temp2 = False
 
     def update_level_finished(self, record_score=True):
@@ -289,7 +308,7 @@ class Main:
                 self.planet.close(self.level.hud.coins)
             py.quit()
 
-    def update_pygame(self):
+    def update_pygame(self, tick=True):
         """Pygame basic mainloop functions"""
         for event in py.event.get():
             if event.type == py.QUIT:
@@ -301,8 +320,9 @@ class Main:
             if self.level is not None:
                 self.level.update_user_text(event)
         py.display.update()
-        self.clock.tick(self.fps)
+        if tick:
+            self.clock.tick(self.fps)
 
 
 if __name__ == '__main__':
-    Main().mainloop()
+    Main(uncapped='--uncapped' in sys.argv).mainloop()
@@ -1,13 +1,16 @@
 import pygame as py
+from collections import OrderedDict
 from os import listdir
 from os.path import join, isfile
 from itertools import islice
-from math import floor, sin, radians
+from math import ceil, floor, sin, radians
 
 
 class Letter:
     """Function for letter placing"""
-    __slots__ = 'screen', 'letter_images', 'l_img_sizes', 'letter_height', 'l_img_width', 'l_img_offset_y', 'l_img_dict'
+    __slots__ = 'screen', 'letter_images', 'l_img_sizes', 'letter_height', 'l_img_width', 'l_img_offset_y', \
+                'l_img_dict', 'images', 'glyphs', 'strings', 'icons'
+    max_strings = 64
 
     def __init__(self, win: py.display, all_images):
         self.screen = win
@@ -17,19 +20,54 @@ class Letter:
         self.l_img_width = {key: value[0] + 2 for key, value in self.l_img_sizes.items()}
         self.l_img_offset_y = {key: abs(self.letter_height - value[1]) for key, value in self.l_img_sizes.items()}
         self.l_img_dict = {'x': 0, '0': 1, '1': 2, '2': 3, '3': 4, '4': 5, '5': 6, '6': 7, '7': 8, '8': 9, '9': 10}
+        self.glyphs = {}  # (letter, size): scaled letter image
+        self.strings = OrderedDict()  # (txt, size): (rendered txt, width), least recently written first
+        self.icons = {}  # (img_idx, size): scaled hud image
 
     def write_numbers(self, txt: str, x, y, size: float):
-        """Write the numbers listed at a location"""
-        for i in range(0, len(txt)):
-            if txt[i] != ' ':
-                letter = self.l_img_dict[txt[i]]
-                self.screen.blit(py.transform.scale(self.letter_images[letter], (self.l_img_sizes[letter][0] * size,
-                                                                                 self.l_img_sizes[letter][1] * size)),
-                                 (x, y + self.l_img_offset_y[letter] * size))
+        """Write the numbers listed at a location, the rendered numbers are blit at the whole pixel"""
+        key = (txt, size)
+        strings = self.strings
+        if key in strings:
+            strings.move_to_end(key)
+        else:
+            strings[key] = self.render_numbers(txt, size)
+            if len(strings) > self.max_strings:
+                strings.popitem(last=False)
+        text_surf, width = strings[key]
+        self.screen.blit(text_surf, (floor(x), floor(y)))
+        return x + width
+
+    def render_numbers(self, txt: str, size: float, x=0.0, y=0.0):
+        """Renders the numbers onto one surface, returning it with the width written"""
+        orig_x, height, letters = x, 0, []
+        for char in txt:
+            if char != ' ':
+                letter = self.l_img_dict[char]
+                glyph = self.get_glyph(letter, size)
+                letters.append((glyph, (x, y + self.l_img_offset_y[letter] * size)))
+                height = max(height, y + self.l_img_offset_y[letter] * size + glyph.get_height())
                 x += self.l_img_width[letter] * size
             else:
                 x += 27 * size
-        return x
+        text_surf = py.Surface((ceil(x), ceil(height)), py.SRCALPHA)
+        text_surf.blits(letters, False)
+        return text_surf, x - orig_x
+
+    def get_glyph(self, letter: int, size: float):
+        """Returns a letter image scaled to the size, scaling it only once"""
+        key = (letter, size)
+        if key not in self.glyphs:
+            self.glyphs[key] = py.transform.scale(self.letter_images[letter], (self.l_img_sizes[letter][0] * size,
+                                                                               self.l_img_sizes[letter][1] * size))
+        return self.glyphs[key]
+
+    def scale_icon(self, img_idx: int, size: tuple):
+        """Returns a hud image scaled to the size, scaling it only once"""
+        key = (img_idx, size)
+        if key not in self.icons:
+            self.icons[key] = py.transform.scale(self.images[img_idx], size)
+        return self.icons[key]
 
     @staticmethod
     def color_change(frame) -> tuple:
@@ -164,7 +202,7 @@ class Planet_Hud(Letter):
     def draw_level_info(self, x, y, font_height, level, add_y=0):
         for i, state, flag in ((0, 'green', 34), (1, 'red', 35)):
             if state in self.level_progress.level_data[level.id]['state']:
-                self.screen.blit(py.transform.scale(self.images[flag], (font_height, font_height)),
+                self.screen.blit(self.scale_icon(flag, (font_height, font_height)),
                                  (x, add_y + y))
                 x += font_height + 2
 
@@ -181,7 +219,7 @@ class Planet_Hud(Letter):
                 x += font_height + 1
             proportion = self.images[img_idx].get_size()
             proportion = proportion[1] / proportion[0]
-            self.screen.blit(py.transform.scale(self.images[img_idx], (font_height, font_height * proportion)), (x, y))
+            self.screen.blit(self.scale_icon(img_idx, (font_height, font_height * proportion)), (x, y))
             prev_idx = img_idx
 
     def menu_inputs(self, x, y):
@@ -226,7 +264,7 @@ class Planet_Hud(Letter):
     def draw_player_lives(self, x, y, img_width, lives):
         """Draws the player lives hud"""
         img_dict = {1: 28, 2: 30, 3: 32}
-        self.screen.blit(py.transform.scale(self.images[img_dict[self.player]], (img_width, img_width)), (x, y))
+        self.screen.blit(self.scale_icon(img_dict[self.player], (img_width, img_width)), (x, y))
         ix = self.write_numbers(f'x{floor(lives)}', x + img_width - img_width // 12,
                                 y + img_width - self.letter_height * (img_width / 76),
                                 img_width / (2 * self.letter_height))
@@ -234,11 +272,11 @@ class Planet_Hud(Letter):
         lives = int(round(10 * (lives - floor(lives))))
         ix += self.sc_width // 66
         for live in range(floor(lives / 2)):
-            self.screen.blit(py.transform.scale(self.images[17], (img_width / 2, img_width / 2)),
+            self.screen.blit(self.scale_icon(17, (img_width / 2, img_width / 2)),
                              (ix, y + img_width / 2))
             ix += 2 + img_width / 2
         if lives % 2 == 1 and lives > 0:
-            self.screen.blit(py.transform.scale(self.images[18], (img_width / 2, img_width / 2)),
+            self.screen.blit(self.scale_icon(18, (img_width / 2, img_width / 2)),
                              (ix, y + img_width / 2))
 
     def draw_gem_count(self, x, y, img_width):
@@ -246,7 +284,7 @@ class Planet_Hud(Letter):
             x += img_width / 3
             proportion = self.images[img_idx].get_size()
             proportion = proportion[1] / proportion[0]
-            self.screen.blit(py.transform.scale(self.images[img_idx], (img_width, img_width * proportion)), (x, y))
+            self.screen.blit(self.scale_icon(img_idx, (img_width, img_width * proportion)), (x, y))
         self.write_numbers(f'x{self.gem_count}', x + img_width - img_width // 12,
                            y + img_width - self.letter_height * (img_width / 76),
                            img_width / (2 * self.letter_height))
@@ -254,9 +292,10 @@ class Planet_Hud(Letter):
 
 class Level_Hud(Letter):
     """Functions for displaying hud in levels"""
-    __slots__ = 'images', 'img_sizes', 'sc_width', 'sc_height', 'img_size', 'level_font', 'coin_jump', 'coin_y', \
+    __slots__ = 'img_sizes', 'sc_width', 'sc_height', 'img_size', 'level_font', 'coin_jump', 'coin_y', \
                 'player', 'player_cls', 'coins', 'timer', 'r_timer', 'score', 'score_for_life', 'lives', 'collected', \
                 'save_collected', 'temp', 'sc_particle_func'
+    steps_per_second = 60  # The timer counts simulation steps
     orig_score_for_life = [10000, 50000, 100000, 200000, 400000, 800000, 1000000, 2000000, 4000000, 8000000]
     bounce_counter = 0
 
@@ -275,7 +314,7 @@ class Level_Hud(Letter):
         self.player_cls = player_cls
         self.coins = 0
         self.timer = 300
-        self.r_timer = py.time.get_ticks()
+        self.r_timer = 0
         self.score = 0
         self.score_for_life = self.orig_score_for_life.copy()
         self.lives = 3
@@ -286,37 +325,45 @@ class Level_Hud(Letter):
 
     def reset_hud(self):
         """Resets hud settings"""
-        self.score, self.timer, self.temp, self.collected = 0, 300, [0, True, 0], list(self.save_collected)
+        self.score, self.timer, self.r_timer, self.temp, self.collected = \
+            0, 300, 0, [0, True, 0], list(self.save_collected)
         self.__class__.bounce_counter = 0
 
-    def draw(self):
-        """Runs the functions and paints them on the screen"""
-        x, y, img_width = self.paint_player()
-        space, coin_y = self.paint_coins(x, y, img_width)
-        self.show_collected(x, coin_y, img_width, space)
-        x = self.display_timer(y, img_width)
-        self.display_score(x, y, img_width, space)
-        self.run_coin_jump()
-        if self.temp[0] > 0:
-            self.display_complete()
+    def draw(self, *, render=True, tick=True):
+        """Runs the functions and paints them on the screen, only ticking changes lives, coins and score"""
+        if tick:
+            self.check_coins_for_life()
+            self.check_score_for_life()
+        if render:
+            x, y, img_width = self.paint_player()
+            space, coin_y = self.paint_coins(x, y, img_width)
+            self.show_collected(x, coin_y, img_width, space)
+            x = self.display_timer(y, img_width)
+            self.display_score(x, y, img_width, space)
+            if self.temp[0] > 0:
+                self.display_complete()
+        if tick:
+            self.run_coin_jump()
+            if self.temp[0] > 0:
+                self.tick_complete()
 
     def paint_player(self):
         """Paint player hud onto screen"""
         img_dict = {1: 28, 2: 30, 3: 32}
         img_width = self.img_size / 1.2
         x, y = self.sc_width // 26, self.sc_height // 33
-        self.screen.blit(py.transform.scale(self.images[img_dict[self.player]], (img_width, img_width)), (x, y))
+        self.screen.blit(self.scale_icon(img_dict[self.player], (img_width, img_width)), (x, y))
         ix = self.write_numbers(f'x{self.lives}', x + img_width - img_width // 12,
                                 y + img_width - self.letter_height * (img_width / 76),
                                 img_width / (2 * self.letter_height))
         # Hearts
         ix += self.sc_width // 66
         for live in range(floor(self.player_cls.lives / 2)):
-            self.screen.blit(py.transform.scale(self.images[17], (img_width / 2, img_width / 2)),
+            self.screen.blit(self.scale_icon(17, (img_width / 2, img_width / 2)),
                              (ix, y + img_width / 2))
             ix += 2 + img_width / 2
         if self.player_cls.lives % 2 == 1 and self.player_cls.lives > 0:
-            self.screen.blit(py.transform.scale(self.images[18], (img_width / 2, img_width / 2)),
+            self.screen.blit(self.scale_icon(18, (img_width / 2, img_width / 2)),
                              (ix, y + img_width / 2))
         return x, y, img_width
 
@@ -334,20 +381,21 @@ class Level_Hud(Letter):
 
     def paint_coins(self, player_x, player_y, player_img_width, from_planet_menu=False):
         """Paint coins hud onto screen"""
-        # 100 Coins -> 1 Live
-        if self.coins > 100:
-            self.lives += 1
-            self.check_player_lives()
-            self.coins -= 100
-
         space = self.sc_height // 78
         x, img_width = player_x, player_img_width - 10
         y = player_y if from_planet_menu else player_y + player_img_width + space
-        self.screen.blit(py.transform.scale(self.images[11], (img_width, img_width)), (x, y))
+        self.screen.blit(self.scale_icon(11, (img_width, img_width)), (x, y))
         self.write_numbers(f'x{self.coins}', x + img_width - img_width / 30, y + img_width - self.letter_height *
                            (img_width / 46 - self.coin_y), img_width / (1.2 * self.letter_height))
         return space, y
 
+    def check_coins_for_life(self):
+        """100 Coins -> 1 Live"""
+        if self.coins > 100:
+            self.lives += 1
+            self.check_player_lives()
+            self.coins -= 100
+
     def show_collected(self, x, y, img_width, space):
         orig_x, y, img_width = x, y + img_width + space, img_width / 2
         if sorted(self.collected) != self.collected:
@@ -366,7 +414,7 @@ class Level_Hud(Letter):
                 x = orig_x
             proportion = self.images[img_idx].get_size()
             proportion = proportion[1] / proportion[0]
-            self.screen.blit(py.transform.scale(self.images[img_idx], (img_width, img_width * proportion)), (x, y))
+            self.screen.blit(self.scale_icon(img_idx, (img_width, img_width * proportion)), (x, y))
             prev_idx = img_idx
 
     def run_coin_jump(self):
@@ -386,17 +434,17 @@ class Level_Hud(Letter):
         """Displays the timer onto the screen"""
         time = str(self.timer).zfill(3)
         x = self.sc_width - self.sc_width // 6
-        self.screen.blit(py.transform.scale(self.images[33], (img_width, img_width)), (x, y))
+        self.screen.blit(self.scale_icon(33, (img_width, img_width)), (x, y))
         self.write_numbers(time, x + img_width + img_width / 5, y + img_width - self.letter_height *
                            (img_width / 45), img_width / (1.2 * self.letter_height))
         return x
 
     def run_timer(self):
-        """Ticks the timer"""
-        time_passed = floor((py.time.get_ticks() - self.r_timer) / 1000)
-        if time_passed >= 1:
-            self.timer -= time_passed if time_passed < 2 else 1
-            self.r_timer = py.time.get_ticks()
+        """Ticks the timer, counting simulation steps instead of real time so replays stay the same"""
+        self.r_timer += 1
+        if self.r_timer >= self.steps_per_second:
+            self.timer -= 1
+            self.r_timer = 0
             if self.timer < 0:
                 self.timer = 0
                 self.player_cls.lives = 0
@@ -404,12 +452,15 @@ class Level_Hud(Letter):
 
     def display_score(self, x, y, img_width, space):
         """Displays the score onto the screen"""
+        score = str(self.score).zfill(7)
+        self.write_numbers(score, x, y + img_width + space, img_width / (1.75 * self.letter_height))
+
+    def check_score_for_life(self):
+        """Gives a life each time the score passes the next threshold"""
         if self.score >= self.score_for_life[0]:
             self.lives += 1
             self.check_player_lives()
             del self.score_for_life[0]
-        score = str(self.score).zfill(7)
-        self.write_numbers(score, x, y + img_width + space, img_width / (1.75 * self.letter_height))
 
     def update_score(self, *, score=None, pos=None):
         """Updates score based on enemy killing through player jumps"""
@@ -447,6 +498,10 @@ class Level_Hud(Letter):
             else (self.sc_width + size_x) / 2
         text_rect = text_surf.get_rect(center=(x - size_x / 2, self.sc_height / 2))
         self.screen.blit(text_surf, text_rect)
+
+    def tick_complete(self):
+        """Moves the level complete text along"""
+        color_switch = 5
         if (self.temp[0] / 15) * color_switch > self.color_change('')[0] - color_switch:
             self.temp[0] = 1
             self.temp[1] = False
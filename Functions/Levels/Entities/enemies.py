@@ -1,6 +1,5 @@
 import pygame.sprite
 from math import floor, sin, degrees, sqrt
-from random import randint
 
 from .entity_settings import Entity, Collidable_Entity, Movable_Tile
 
@@ -105,7 +104,7 @@ class Bat(Entity):
         """Lets the bat fly"""
         self.image = self.images[0 if round(self.frame * 24) % 2 < 1 else 2]
         dir_dict = {True: -1, False: 1}
-        self.x += dir_dict[self.dir] * randint(1, 3)
+        self.x += dir_dict[self.dir] * self.entity.rng.randint(1, 3)
         self.y = self.fly_y - self.fly_path(self.x)
 
     def fly_path(self, x):
@@ -210,7 +209,8 @@ class Spike(Entity):
     def manage_global_entities(self):
         """Gives the spike the function of being a global ground"""
         # Spikes are global grounds, meaning entities on spikes will never de-spawn
-        for entity in self.entity.entities.values():
+        around = self.rect.union(self.rect.move(0, -self.tile_size)).move(self.camera_x, self.camera_y)
+        for entity in self.entity.query_rect(around).values():
             if entity == self:
                 continue
             if pygame.sprite.collide_rect(entity, self):
@@ -342,7 +342,7 @@ class Frog(Collidable_Entity):
 
         self.handle_collision()
         if self.falling == 0 and not self.delaying:
-            self.jumping = -1 * randint(30, 60)
+            self.jumping = -1 * self.entity.rng.randint(30, 60)
             self.delaying = True
         if self.falling < 2 or self.jumping > 0:
             self.jumping += 1
@@ -548,7 +548,8 @@ class Laser_Shooter(Entity):
         if pygame.sprite.collide_rect(self.player, self):
             self.player.collided.append(self)
 
-        for entity in (v for v in self.entity.entities.values() if not v == self and hasattr(v, 'collided')):
+        for entity in (v for v in self.entity.query_rect(self.rect.move(self.camera_x, self.camera_y),
+                                                          Collidable_Entity).values() if not v == self):
             if pygame.sprite.collide_rect(entity, self):
                 entity.collided.append(self)
 
@@ -692,17 +693,19 @@ class Laser(Entity):
             self.player.frame = 0
             # self.player.minus_life()
 
-        for _, entity in {key: value for key, value in self.entity.entities.items() if not value == self and
-                          self.x - 16 < value.x < self.x + 16 and self.y - 16 < value.y < self.y + 16 and
-                          (hasattr(value, 'pins') or hasattr(value, 'frame_after_death') or hasattr(value, 'mov_dir')
-                          or value.__class__.__name__ == 'Coin' or value.__class__.__name__ == 'Button')}.items():
+        near = self.entity.query_rect(pygame.Rect(self.x - 16, self.y - 16, 32, 32))
+        collidables, movable_tiles, buttons = (self.entity.registries[kind] for kind in
+                                               ('collidables', 'movable_tiles', 'buttons'))
+        for key, entity in {key: value for key, value in near.items() if not value == self and
+                            self.x - 16 < value.x < self.x + 16 and self.y - 16 < value.y < self.y + 16 and
+                            (key in collidables or key in movable_tiles or key in buttons)}.items():
             if pygame.sprite.collide_rect(entity, self):
                 if hasattr(entity, 'mov_dir'):
                     value = tuple(self.find_my_idx().keys())[0]
                     for laser in (v for k, v in self.orig_launcher.lasers.items() if k > value):
                         laser.show = False
                     self.more_init()
-                elif entity.__class__.__name__ == 'Button':
+                elif key in buttons:
                     value_dict = self.find_my_idx()
                     entity.collided_lasers[tuple(value_dict.keys())[0]] = self
                 else:
@@ -835,7 +838,7 @@ class Piranha(Entity):
         if self.jump_frame < 0:  # Initialize values
             self.set_jump_height()
             self.jump_frame = 0
-            self.delay = randint(5, 40) * 0.1
+            self.delay = self.entity.rng.randint(5, 40) * 0.1
             self.frame_after_delay = 0
         elif self.jump_frame < 1:  # Delay
             self.frame_after_delay += 1 / 60
@@ -1047,10 +1050,11 @@ class Snail(Collidable_Entity):
         if self.kicked:
             # Loops through entities near the shell
             self.global_, self.global__ = True, True
-            for _, entity in {key: value for key, value in self.entity.entities.items() if value != self and
+            near = self.entity.query_rect(pygame.Rect(self.x - 16, self.y - 16, 32, 32))
+            collidables = self.entity.registries['collidables']
+            for _, entity in {key: value for key, value in near.items() if value != self and
                               self.x - 16 < value.x < self.x + 16 and self.y - 16 < value.y < self.y + 16 and
-                              (hasattr(value, 'pins') or hasattr(value, 'frame_after_death') or
-                               value.__class__.__name__ == 'Coin')}.items():
+                              key in collidables}.items():
                 if entity.__class__.__name__ == 'Weight':
                     continue
                 # Killing entities
@@ -1,12 +1,34 @@
+from random import Random
+from bisect import bisect_left, insort
+from heapq import merge
+from itertools import chain
 from .enemies import *
 from .items import *
+try:
+    from ...sim_clock import lerp
+except ImportError:
+    from sim_clock import lerp
 
 
 class All_Entities:
     """Storing all entities"""
     __slots__ = 'screen', 'sc_width', 'sc_height', 'player', 'editor', 'hud', 'entity_size', 'path', 'camera_x', \
                 'camera_y', 'grid_list', 'grid_list_info', 'entities', 'running_entities', 'entity_dict', 'door_state',\
-                'total_doors', 'key_cls'
+                'total_doors', 'key_cls', 'cell_size', 'cells', 'entity_cells', 'entity_keys', 'global_entities', \
+                'draw_layers', 'next_rank', 'registries', 'coarse_rate', 'coarse_entities', 'frame_count', 'render', \
+                'prev_pos', 'rng', 'work_list', 'fresh', 'running', 'layers', 'running_order'
+    # What each hot loop looks for, entities are sorted into a registry per kind when they are added
+    registry_kinds = {'movable_tiles': lambda entity: isinstance(entity, Movable_Tile),
+                      'items': lambda entity: hasattr(entity, 'collected'),
+                      # What lasers and kicked shells bounce
+                      'collidables': lambda entity: hasattr(entity, 'pins') or
+                                                    hasattr(entity, 'frame_after_death') or isinstance(entity, Coin),
+                      'switches': lambda entity: isinstance(entity, Switch),
+                      'buttons': lambda entity: isinstance(entity, Button),
+                      'laser_shooters': lambda entity: isinstance(entity, Laser_Shooter),
+                      # Initialized after the rest as they look for other entities
+                      'power_ups': lambda entity: hasattr(entity, 'enemies')}
+    draw_priorities = 0, 9, 10  # Drawing layers from first to last drawn, see sort_entities
 
     def __init__(self, win: py.display, player_cls, editor_cls, hud_cls, size, path=''):
         self.screen = win
@@ -22,7 +44,7 @@ class All_Entities:
         self.grid_list = {}
         self.grid_list_info = {}
         self.entities = {}
-        self.running_entities = {}
+        self.running_entities = []
         self.entity_dict = {566: Bomb,
                             567: {0: Button}, 569: {0: Button}, 571: {0: Button}, 573: {0: Button},
                             575: {0: Coin}, 576: {0: Coin}, 577: {0: Coin},
@@ -60,10 +82,42 @@ class All_Entities:
         # For Keys
         self.key_cls = Key
 
+        # Spatial hash of entities, bucketed by chunks of 16 x 16 tiles
+        self.cell_size = size * 16
+        self.cells = {}  # (cell_x, cell_y): [tile_idx] in the order they were added
+        self.entity_cells = {}  # tile_idx: (cell_x, cell_y)
+        self.entity_keys = {}  # id(entity): tile_idx
+        self.global_entities = {}  # id(entity): entity, entities that were set global, see Entity.global_
+        self.draw_layers = {}  # tile_idx: (drawing priority, order it was added in)
+        self.next_rank = 0
+
+        self.registries = {kind: {} for kind in self.registry_kinds}  # kind: {tile_idx: entity}
+
+        # Global entities far from the camera run at the detail their class asks for, see Entity.far_tier
+        self.coarse_rate = 4  # Frames between coarse ticks
+        self.coarse_entities = {}  # tile_idx: frames it is behind
+        self.frame_count = 0
+
+        # Fixed time step, see sim_clock.py
+        self.render = True  # False while catching up simulation steps that are not drawn
+        self.prev_pos = {}  # tile_idx: (x, y) before the last simulation step, for drawing in between steps
+        self.rng = Random()  # Entity randomness, seeded per level so replays stay the same
+
+        # Entities are only positioned and drawn when near the camera, see update_running_entities
+        self.work_list = []  # tile_idx of the entities to draw this frame, in the order they were added
+        # Running entities are kept in order as they start and stop running, so they are never sorted
+        self.running = set()  # tile_idx
+        self.layers = {priority: [] for priority in self.draw_priorities}  # drawing priority: [tile_idx] in order
+        self.running_order = []  # tile_idx in the order they were added
+        self.fresh = set()  # tile_idx of the entities whose rectangles are up to date with the camera
+
     def init_entities(self):
         """Initializes all entities"""
         Door.total_doors = 0
         self.entities = {}
+        self.global_entities = {}
+        self.coarse_entities = {}
+        self.work_list, self.fresh = [], set()
         for entity in self.grid_list:
             spawn_entity = self.entity_dict[int(self.grid_list[entity])]
             if entity in self.grid_list_info:
@@ -95,17 +149,18 @@ class All_Entities:
                                                      hud_cls=self.hud, entity_cls=self)
 
         # Init Entities
-        other_enemies = {}
+        self.rebuild_registries()
+        power_ups, switches = self.registries['power_ups'], self.registries['switches']
+        for tile_idx, entity in self.entities.items():
+            if tile_idx not in power_ups and tile_idx not in switches:
+                entity.init_entity(tile_idx)
         for tile_idx, entity in self.entities.items():
-            if hasattr(entity, 'enemies') or hasattr(entity, 'switch_groups'):
-                other_enemies[tile_idx] = entity
-                continue
-            entity.init_entity(tile_idx)
-        for tile_idx, entity in other_enemies.items():
-            entity.init_entity(tile_idx)
+            if tile_idx in power_ups or tile_idx in switches:
+                entity.init_entity(tile_idx)
 
         self.total_doors = Door.total_doors
         Gem.collected = 0
+        self.rebuild_cells()
 
     def add_to_entities(self, tile_idx, idx, info=None):
         """Adds an entity to the entities dict"""
@@ -138,66 +193,103 @@ class All_Entities:
             self.entities[tile_idx] = spawn_entity(self.screen, self.path, info,
                                                    player_cls=self.player, editor_cls=self.editor, hud_cls=self.hud,
                                                    entity_cls=self)
+        self.add_to_registries(tile_idx)
         self.entities[tile_idx].init_entity(tile_idx)
         self.total_doors = Door.total_doors
+        self.add_to_cells(tile_idx)
 
     def delete_from_entities(self, tile_idx):
         """Removes an entity from the entities dict"""
+        self.remove_from_cells(tile_idx)
+        for registry in self.registries.values():
+            registry.pop(tile_idx, None)
+        self.coarse_entities.pop(tile_idx, None)
         del self.entities[tile_idx]
 
-    def update_entities(self, update_all=False):
-        """Updates all entities camera positions"""
-        if update_all:
-            entities = self.entities
-        else:
-            entities = self.running_entities
-        for entity in entities:
-            self.entities[entity].camera_x = self.camera_x
-            self.entities[entity].camera_y = self.camera_y
+    def add_to_registries(self, tile_idx):
+        """Sorts an entity into the registries of its kinds, a replaced entity keeps its place in them"""
+        entity = self.entities[tile_idx]
+        for kind, is_kind in self.registry_kinds.items():
+            if is_kind(entity):
+                self.registries[kind][tile_idx] = entity
+            else:
+                self.registries[kind].pop(tile_idx, None)
+
+    def rebuild_registries(self):
+        """Sorts every entity into the registries, in the order of the entities dict"""
+        self.registries = {kind: {} for kind in self.registry_kinds}
+        for tile_idx in self.entities:
+            self.add_to_registries(tile_idx)
 
     def move_entity(self):
         """Entity Mainloop"""
-        i = 0
         self.update_running_entities()
-        # self.update_entities(True)
         # Initializes Movable Tile touching values
         for groups, value in Movable_Tile.group_touching.items():
             Movable_Tile.group_touching[groups] += 1
         self.player.can_climb = False
 
-        for entity in self.running_entities:
+        camera_x, camera_y = self.camera_x, self.camera_y
+        for tile_idx in self.running_entities:
+            entity = self.entities[tile_idx]
             # Reset global values
-            if not self.entities[entity].__class__.__name__ == "Spike":
-                self.entities[entity].global_ = False
-            self.entities[entity].update_draw_pos()
-            self.entities[entity].mainloop()
-            i += 1
+            if not entity.__class__.__name__ == "Spike":
+                entity.global_ = False
+            entity.update_draw_pos(camera_x, camera_y)
+            self.fresh.add(tile_idx)
+            entity.mainloop()
+            self.move_in_cells(tile_idx)
+        self.run_coarse_entities()
 
         # Updates movable tile positions
-        for entity in {k: v for k, v in self.entities.items() if
-                       hasattr(v, 'update_touch') and floor(v.group) in Movable_Tile.group_touching}:
-            if Movable_Tile.group_touching[floor(self.entities[entity].group)] == 0:
-                self.entities[entity].update_touch()
-            # i += 1
+        for tile_idx, entity in self.registries['movable_tiles'].items():
+            if Movable_Tile.group_touching.get(floor(entity.group)) == 0:
+                entity.update_touch()
+                self.move_in_cells(tile_idx)
 
-        self.update_entities()
         Barnacle.img_frame += 0.01
-        print(i)
-
-    def draw_entity(self):
-        """Draws all entities onto screen"""
-        self.update_entities(True)
-        for entity in self.entities:
-            if hasattr(entity, 'collected'):
-                continue
-            self.entities[entity].update_draw_pos()
-            self.entities[entity].draw()
-
-    def draw_items(self):
+
+    def work(self, items=False):
+        """The entities (or only items) to position and draw this frame, in the order they were added
+        Entities that are not running are off screen, the editor draws all of them"""
+        registry = self.registries['items']
+        for tile_idx in ((registry if items else self.entities) if self.editor.editor else self.work_list):
+            if (tile_idx in registry) == items:
+                yield tile_idx, self.entities[tile_idx]
+
+    def draw_entity(self, render=True):
+        """Draws entities onto screen, positions are still updated when not rendering as collisions use them"""
+        self.render = render
+        camera_x, camera_y = self.camera_x, self.camera_y
+        for _, entity in self.work():  # Items are drawn later by draw_items
+            entity.update_draw_pos(camera_x, camera_y)
+            entity.draw()
+        self.fresh = set(self.entities if self.editor.editor else self.work_list)
+
+    def draw_items(self, render=True):
         """Draws all items"""
-        for entity in (k for k, v in self.entities.items() if hasattr(v, 'collected')):
-            self.entities[entity].update_draw_pos()
-            self.entities[entity].draw()
+        self.render = render
+        camera_x, camera_y = self.camera_x, self.camera_y
+        for _, entity in self.work(items=True):
+            entity.update_draw_pos(camera_x, camera_y)
+            entity.draw()
+
+    def snapshot_positions(self):
+        """Remembers where the running entities are before a simulation step"""
+        self.prev_pos = {tile_idx: (self.entities[tile_idx].x, self.entities[tile_idx].y)
+                         for tile_idx in self.running_entities if tile_idx in self.entities}
+
+    def paint_entities(self, alpha, camera_x, camera_y, items=False):
+        """Only draws entities (or items) in between their last two simulation steps"""
+        self.render = True
+        limit = self.entity_size * 4
+        for tile_idx, entity in self.work(items):
+            draw_x, draw_y = entity.draw_x, entity.draw_y
+            prev_x, prev_y = self.prev_pos.get(tile_idx, (entity.x, entity.y))
+            entity.draw_x = lerp(prev_x, entity.x, alpha, limit) - camera_x
+            entity.draw_y = lerp(prev_y, entity.y, alpha, limit) - camera_y
+            entity.draw()
+            entity.draw_x, entity.draw_y = draw_x, draw_y
 
     # Optimization: Instead of running for all entities, run the ones on screen
     # From min 56 fps -> min 58 fps
@@ -205,6 +297,10 @@ class All_Entities:
         """Determines if the entity shouuld be checked"""
         if ent.global_ or ent.global__:
             return True
+        return self.near_camera(ent)
+
+    def near_camera(self, ent) -> bool:
+        """If the entity is on screen or up to 6 tiles away from it"""
         draw_x = ent.x - self.camera_x
         draw_y = ent.y - self.camera_y
         return not (draw_x < -ent.width - ent.tile_size * 6 or \
@@ -213,9 +309,142 @@ class All_Entities:
                     draw_y < -ent.height - ent.tile_size * 6)
 
     def update_running_entities(self):
-        self.running_entities = [(key, value) for key, value in self.entities.items() if self.on_screen(value)]
-        self.running_entities = sorted(self.running_entities, key=lambda x: self.sort_entities(x[1]))
-        self.running_entities = (key for key, value in self.running_entities)
+        """Finds the entities to run from the cells around the camera and the global entities, in drawing order"""
+        margin, size = self.entity_size * 6, self.cell_size
+        # An extra cell on every side for entities bigger than the margin
+        buckets = self.buckets_in_area(self.camera_x - margin - size * 2, self.camera_y - margin - size * 2,
+                                       self.camera_x + self.sc_width + margin + size,
+                                       self.camera_y + self.sc_height + margin + size)
+        running = {tile_idx for bucket in buckets for tile_idx in bucket if self.near_camera(self.entities[tile_idx])}
+        coarse = {}
+        for key, entity in tuple(self.global_entities.items()):
+            tile_idx = self.entity_keys.get(key)
+            if not ((entity.global_ or entity.global__) and self.entities.get(tile_idx) is entity):
+                del self.global_entities[key]
+            elif tile_idx in running or entity.far_tier == 'full' or self.editor.editor:
+                running.add(tile_idx)
+            elif entity.far_tier == 'coarse':
+                coarse[tile_idx] = self.coarse_entities.get(tile_idx, 0)
+        # Entities coming back near the camera catch up on the frames they are behind
+        for tile_idx, frames in self.coarse_entities.items():
+            if frames and tile_idx in running and not self.editor.editor:
+                self.refresh(tile_idx)
+                self.entities[tile_idx].coarse_tick(frames)
+                self.move_in_cells(tile_idx)
+        self.coarse_entities = coarse
+        for tile_idx in self.running - running:
+            self.stop_running(tile_idx)
+        for tile_idx in running - self.running:
+            self.start_running(tile_idx)
+        self.running_entities = [tile_idx for priority in self.draw_priorities for tile_idx in self.layers[priority]]
+        self.work_list = self.running_order[:]
+
+    def start_running(self, tile_idx):
+        """Inserts an entity into its drawing layer and the running order"""
+        priority, _ = self.draw_layers[tile_idx]
+        insort(self.layers[priority], tile_idx, key=self.rank)
+        insort(self.running_order, tile_idx, key=self.rank)
+        self.running.add(tile_idx)
+
+    def stop_running(self, tile_idx):
+        """Takes an entity out of its drawing layer and the running order"""
+        priority, rank = self.draw_layers[tile_idx]
+        for ordered in self.layers[priority], self.running_order:
+            del ordered[bisect_left(ordered, rank, key=self.rank)]
+        self.running.discard(tile_idx)
+
+    def rank(self, tile_idx) -> int:
+        """The order an entity was added in"""
+        return self.draw_layers[tile_idx][1]
+
+    def run_coarse_entities(self):
+        """Ticks each far away coarse entity once every few frames, for all the frames it is behind"""
+        self.frame_count += 1
+        for tile_idx in self.coarse_entities:
+            self.coarse_entities[tile_idx] += 1
+            if (self.frame_count + self.draw_layers[tile_idx][1]) % self.coarse_rate == 0:  # Spread over the frames
+                self.refresh(tile_idx)
+                self.entities[tile_idx].coarse_tick(self.coarse_entities[tile_idx])
+                self.coarse_entities[tile_idx] = 0
+                self.move_in_cells(tile_idx)
+
+    """Spatial hash"""
+
+    def get_cell(self, entity) -> tuple:
+        return floor(entity.x / self.cell_size), floor(entity.y / self.cell_size)
+
+    def buckets_in_area(self, left, top, right, bottom) -> list:
+        """The ordered tile_idx buckets of the cells overlapping an area in level coordinates"""
+        size, cells = self.cell_size, self.cells
+        return [cells[cell_x, cell_y] for cell_x in range(floor(left / size), floor(right / size) + 1)
+                for cell_y in range(floor(top / size), floor(bottom / size) + 1) if cells.get((cell_x, cell_y))]
+
+    def query_rect(self, rect, kinds=None, ordered=True) -> dict:
+        """Entities that may touch a rectangle in level coordinates, in the order of the entities dict
+        Kinds is a class or tuple of classes the entities have to be, the exact collision is left to the caller
+        Callers that do not depend on the order can skip merging the cells with ordered=False"""
+        margin = self.cell_size  # Entity rectangles can start up to a cell before their x and y
+        entities, buckets = self.entities, self.buckets_in_area(rect.left - margin, rect.top - margin,
+                                                                 rect.right + self.entity_size,
+                                                                 rect.bottom + self.entity_size)
+        if kinds is not None:
+            buckets = [bucket for bucket in ([tile_idx for tile_idx in bucket if isinstance(entities[tile_idx], kinds)]
+                                             for bucket in buckets) if bucket]
+        # Each bucket is in order already, only the buckets of several cells have to be merged
+        near = {tile_idx: entities[tile_idx] for tile_idx in (merge(*buckets, key=self.rank) if ordered and
+                                                              len(buckets) > 1 else chain.from_iterable(buckets))}
+        for tile_idx in near:
+            if tile_idx not in self.fresh:  # Callers compare rectangles
+                self.refresh(tile_idx)
+        return near
+
+    def refresh(self, tile_idx):
+        """Brings the rectangle of an entity that was not positioned this frame up to date with the camera"""
+        self.entities[tile_idx].update_draw_pos(self.camera_x, self.camera_y)
+        self.fresh.add(tile_idx)
+
+    def add_to_cells(self, tile_idx):
+        """Puts an entity into its cell and drawing layer, a replaced entity keeps its place in the order"""
+        entity = self.entities[tile_idx]
+        if tile_idx in self.entity_cells:
+            if tile_idx in self.running:  # It may be drawn in another layer now, it runs again next frame
+                self.stop_running(tile_idx)
+            self.take_from_cell(tile_idx, self.entity_cells[tile_idx])
+            rank = self.draw_layers[tile_idx][1]
+        else:
+            rank, self.next_rank = self.next_rank, self.next_rank + 1
+        self.draw_layers[tile_idx] = (self.sort_entities(entity), rank)
+        cell = self.entity_cells[tile_idx] = self.get_cell(entity)
+        insort(self.cells.setdefault(cell, []), tile_idx, key=self.rank)
+        self.entity_keys[id(entity)] = tile_idx
+
+    def remove_from_cells(self, tile_idx):
+        """Takes an entity out of the spatial hash"""
+        if tile_idx in self.running:
+            self.stop_running(tile_idx)
+        self.take_from_cell(tile_idx, self.entity_cells.pop(tile_idx))
+        del self.draw_layers[tile_idx]
+        self.entity_keys.pop(id(self.entities[tile_idx]), None)
+
+    def move_in_cells(self, tile_idx):
+        """Moves an entity to another cell if it left its own"""
+        cell = self.get_cell(self.entities[tile_idx])
+        if cell != self.entity_cells[tile_idx]:
+            self.take_from_cell(tile_idx, self.entity_cells[tile_idx])
+            self.entity_cells[tile_idx] = cell
+            insort(self.cells.setdefault(cell, []), tile_idx, key=self.rank)
+
+    def take_from_cell(self, tile_idx, cell):
+        """Removes an entity from the ordered bucket of a cell"""
+        bucket = self.cells[cell]
+        del bucket[bisect_left(bucket, self.rank(tile_idx), key=self.rank)]
+
+    def rebuild_cells(self):
+        """Puts every entity back into the spatial hash, for when many entities are moved at once"""
+        self.cells, self.entity_cells, self.entity_keys, self.draw_layers, self.next_rank = {}, {}, {}, {}, 0
+        self.running, self.layers, self.running_order = set(), {priority: [] for priority in self.draw_priorities}, []
+        for tile_idx in self.entities:
+            self.add_to_cells(tile_idx)
 
     @staticmethod
     def sort_entities(entity) -> int:
@@ -1,15 +1,25 @@
 import pygame as py
+from collections import OrderedDict
 from os import listdir
 from os.path import join, isfile
 from math import floor
+try:
+    from ..Level_Tiles.Tile_Arts.tile_properties import PASS_LEFT, PASS_RIGHT, SLOPE, SLOPE_CEILING, \
+        SLOPE_FLOOR, PLATFORM, GAP, WATER
+except ImportError:
+    from Levels.Level_Tiles.Tile_Arts.tile_properties import PASS_LEFT, PASS_RIGHT, SLOPE, SLOPE_CEILING, \
+        SLOPE_FLOOR, PLATFORM, GAP, WATER
 
 
 class Entity(py.sprite.Sprite):
     """Attributes for all entities"""
     entity_img_cls = None
     tiles_to_entities = 566
+    # How global entities run when far from the camera: 'full' every frame, 'coarse' with coarse_tick every few
+    # frames or 'dormant' not at all
+    far_tier = 'full'
     __slots__ = 'screen', 'sc_width', 'sc_height', 'player', 'editor', 'tiles', 'entity', 'hud', 'show_last', 'idx', \
-                'images', 'image', 'dir', 'show', 'destroyed', 'de_spawn', 'global_', 'global__', 'ready_spawn', \
+                'images', 'image', 'dir', 'show', 'destroyed', 'de_spawn', '_global_', '_global__', 'ready_spawn', \
                 'mystery', 'group', 'switched', 'x', 'draw_x', 'x_vel', 'y', 'draw_y', 'y_vel', 'orig_x', 'orig_y', \
                 'camera_x', 'camera_y', 'img_height', 'img_width', 'scale', 'height', 'width', 'tile_size', 'frame', \
                 'alpha', 'rotation', 'rect', 'mask', 'state', 'hit_img', 'ded_img', 'init_editor', 'exit_editor', \
@@ -17,8 +27,8 @@ class Entity(py.sprite.Sprite):
 
     def __init__(self, win: py.display, path, entity_type, group, *, player_cls, editor_cls, hud_cls, entity_cls):
         super().__init__()
-        if self.__class__.entity_img_cls.__class__.__name__ != 'Entity_Img':
-            self.__class__.entity_img_cls = Entity_Img(path)
+        if Entity.entity_img_cls is None:  # Shared by every kind of entity
+            Entity.entity_img_cls = Entity_Img(path)
             # self.print_used_variables()
         # Basic yet important variables, also including classes
         self.screen = win
@@ -90,6 +100,27 @@ class Entity(py.sprite.Sprite):
         self.space = False
         self.rising_editor = True
 
+    @property
+    def global_(self) -> bool:
+        return self._global_
+
+    @global_.setter
+    def global_(self, value):
+        """All_Entities keeps track of global entities so it can run them without checking every entity"""
+        self._global_ = value
+        if value:
+            self.entity.global_entities[id(self)] = self
+
+    @property
+    def global__(self) -> bool:
+        return self._global__
+
+    @global__.setter
+    def global__(self, value):
+        self._global__ = value
+        if value:
+            self.entity.global_entities[id(self)] = self
+
     def init_entity(self, tile_idx):
         """Initialises entity scripts"""
         self.x = floor((tile_idx - 1) / self.editor.grid_height) * self.tile_size
@@ -116,19 +147,18 @@ class Entity(py.sprite.Sprite):
         """Draws onto screen"""
         if self.editor.editor and hasattr(self, 'r_mov_dir'):
             self.draw_path()
-        if self.show:
-            dir_dict = {True: 0, False: 1}
-            image = py.transform.scale(self.image[dir_dict[self.dir]], (self.width, self.height))
-            if image is not None:
-                image.set_alpha(self.alpha)
-            if self.rotation != 0:
-                image = py.transform.rotate(image, self.rotation)
+        if self.show and self.entity.render:
+            entity_img = self.__class__.entity_img_cls
+            image = entity_img.get_sprite(entity_img.index_of[id(self.image)], self.dir,
+                                          (int(self.width), int(self.height)), self.rotation, self.alpha)
             # py.draw.rect(self.screen, '#000000', self.rect)
             self.screen.blit(image, (self.draw_x, self.draw_y))
         self.draw_other()
 
-    def update_draw_pos(self):
-        """Updates drawing position"""
+    def update_draw_pos(self, camera_x=None, camera_y=None):
+        """Updates drawing position, the camera can be given at the same time"""
+        if camera_x is not None:
+            self.camera_x, self.camera_y = camera_x, camera_y
         self.draw_x = self.x - self.camera_x
         self.draw_y = self.y - self.camera_y
         self.update_rectangle_pos()
@@ -262,6 +292,12 @@ class Entity(py.sprite.Sprite):
         self.y += self.y_vel
 
     """Dummy Functions"""
+    def coarse_tick(self, frames):
+        """Runs a coarse entity far from the camera for each of the frames it is behind, classes that can skip work
+        while far away override it"""
+        for _ in range(frames):
+            self.mainloop()
+
     def check_tick(self):
         """Checks the switched state to see which loop follows"""
         if self.switched:
@@ -503,6 +539,7 @@ class Movable_Tile(Entity):
     """Functions for a movable entity which has player collision detection"""
     group_touching = {}  # storing integers for each group's touch values
     copied = ''
+    far_tier = 'coarse'
 
     def __init__(self, win: py.display, path, entity_type, ent_info, *, player_cls, editor_cls, hud_cls, entity_cls):
         self.r_mov_dir = True
@@ -531,9 +568,9 @@ class Movable_Tile(Entity):
         self.in_center = None
         self.switched_block = False
         self.switched_before = False
+        self.far = False  # No collisions while far from the camera
 
-        self.path_in_idx = self.path.replace('>', ',').replace('<', ',').replace('^', ',').replace('v', ',')
-        self.path_in_idx = [int(v) for v in self.path_in_idx.split(',')]
+        self.update_path_in_idx()
         self.width, self.height = self.tiles.tile_size, self.tiles.tile_size
         self.prev_idx = self.path_in_idx[0]
         self.tile_idx = self.path_in_idx[0]
@@ -599,12 +636,12 @@ class Movable_Tile(Entity):
         """Checks if the block is in the center, returns a boolean value weather it crossed into another block or not"""
         self.update_draw_pos()
         self.tile_idx = self.convert_coords_to_tile_idx((self.draw_x, self.draw_y))
-        if self.tile_idx != self.prev_idx and self.tile_idx in self.path_in_idx:
+        if self.tile_idx != self.prev_idx and self.tile_idx in self.path_nodes:
             self.x_vel = self.x - self.prev_x
             self.y_vel = self.y - self.prev_y
             return True
         if round(self.x % self.tile_size) == 0 and round(self.y % self.tile_size) == 0 and \
-                self.tile_idx in self.path_in_idx and self.in_center is False:
+                self.tile_idx in self.path_nodes and self.in_center is False:
             self.in_center = True
         return False
 
@@ -650,80 +687,73 @@ class Movable_Tile(Entity):
             self.prev_idx = self.tile_idx
             self.reached_end = False
             self.at_start = False
-            if self.tile_idx not in self.path_in_idx:
+            if self.tile_idx not in self.path_nodes:
                 self.in_center = False
 
         # Finding where the tile_idx is in the path allocated to the movable tile
-        betweens = []
-        for i, idx in enumerate(self.path_in_idx):
-            if i == len(self.path_in_idx) - 1:
-                continue
-            other_idx = self.path_in_idx[i + 1]
-            if tile_idx in self.path_in_idx:
-                betweens = []
-                break
-            if idx < tile_idx < other_idx or other_idx < tile_idx < idx:
-                betweens.append(idx)
+        if self.waypoint_height != self.tiles.grid_height:
+            self.update_path_in_idx()
+        if tile_idx not in self.waypoints:  # Off the path, only worked out once
+            self.waypoints[tile_idx] = self.find_waypoint(tile_idx)
+        direction, node = self.waypoints[tile_idx]
 
         # Returning the direction
+        if node is None:
+            return direction
+        not_in_path, first, last, after, before = node
+        if self.in_center is False:
+            if not self.mov_dir:
+                return after
+            return None if first else before
+        if not_in_path or self.frame_on_delay < self.delay or len(self.path_in_idx) < 2:
+            return None
+        # If first item in the path
+        elif first:
+            self.r_mov_dir = True
+            self.mov_dir = True
+            self.reached_end = True
+            self.at_start = True
+            if self.switched == -1:
+                return None
+        # If last item in the path
+        elif last:
+            if self.mov_after != 3:
+                self.r_mov_dir = False
+                self.mov_dir = False
+            self.reached_end = True
+            if self.switched == 1 or (self.mov_after == 3 and self.mov_dir):
+                return None
+        return after if self.mov_dir else before
+
+    def find_waypoint(self, tile_idx) -> tuple:
+        """Where a tile is in the path, (direction, None) for tiles between nodes or (None, node) otherwise
+        A node is (not in the path, first, last, direction after, direction before) as written in the path"""
+        betweens = []
+        if tile_idx not in self.path_nodes:
+            betweens = [idx for idx, other_idx in zip(self.path_in_idx, self.path_in_idx[1:])
+                        if idx < tile_idx < other_idx or other_idx < tile_idx < idx]
         if len(betweens) > 1:
-            return self.bruteforce_direction(self.path_in_idx, betweens, tile_idx)
+            return self.bruteforce_direction(self.path_in_idx, betweens, tile_idx), None
         elif betweens:
             idx = self.path.find(str(betweens[0]))
-            return self.path[idx + len(str(betweens[0]))]
-        else:
-            idx = self.path.find(str(tile_idx))
-            if self.in_center is False:
-                if not self.mov_dir:
-                    if idx + len(str(tile_idx)) < len(self.path):
-                        return self.path[idx + len(str(tile_idx))]
-                    else:
-                        return None
-                else:
-                    if idx != 0:
-                        return self.path[idx - 1]
-                    else:
-                        return None
-            if idx < 0 or self.frame_on_delay < self.delay or len(self.path_in_idx) < 2:
-                return None
-            # If first item in the path
-            elif idx == 0:
-                self.r_mov_dir = True
-                self.mov_dir = True
-                self.reached_end = True
-                self.at_start = True
-                if self.switched == -1:
-                    return None
-            # If last item in the path
-            elif idx == len(self.path) - len(str(tile_idx)):
-                if self.mov_after != 3:
-                    self.r_mov_dir = False
-                    self.mov_dir = False
-                self.reached_end = True
-                if self.switched == 1 or (self.mov_after == 3 and self.mov_dir):
-                    return None
-
-            if self.mov_dir:
-                return self.path[idx + len(str(tile_idx))]
-            else:
-                return self.path[idx - 1]
+            return self.path[idx + len(str(betweens[0]))], None
+        idx, length = self.path.find(str(tile_idx)), len(str(tile_idx))
+        return None, (idx < 0, idx == 0, idx == len(self.path) - length,
+                      self.path[idx + length] if idx + length < len(self.path) else None,
+                      self.path[idx - 1] if len(self.path) > 1 else None)
 
     def bruteforce_direction(self, all_idx_list: list, all_idx: list, tile_idx: int):
         """Bruteforce the path code to identify the direction"""
         for idx in all_idx:
             direction = self.path[self.path.find(str(idx)) + len(str(idx))]
             end = all_idx_list[all_idx_list.index(idx) + 1]
-            while idx != end:
-                if direction == '>':
-                    idx += self.tiles.grid_height
-                elif direction == '<':
-                    idx -= self.tiles.grid_height
-                elif direction == '^':
-                    idx += 1
-                elif direction == 'v':
-                    idx -= 1
+            step = {'>': self.tiles.grid_height, '<': -self.tiles.grid_height, '^': 1, 'v': -1}.get(direction, 0)
+            for _ in range(abs(end - idx) if step else 0):  # Never more steps than that to reach the end
+                idx += step
                 if idx == tile_idx:
                     return direction
+                if idx == end:
+                    break
         return None
 
     def check_collisions(self):
@@ -738,10 +768,11 @@ class Movable_Tile(Entity):
                 rect.width += abs(self.player.x_vel) * 2
                 rect.height += abs(self.player.y_vel) * 2
                 return True if rect.colliderect(entity.rect) else False
-            return py.sprite.collide_rect(entity, self) and hasattr(entity, 'falling')
+            return py.sprite.collide_rect(entity, self)
 
-        all_entities = {key: value for key, value in self.entity.entities.items() if near_me(value)}
-        if near_me(self.player):
+        all_entities = {} if self.far else {key: value for key, value in self.entity.query_rect(
+            self.rect.move(self.camera_x, self.camera_y), Collidable_Entity, ordered=False).items() if near_me(value)}
+        if not self.far and near_me(self.player):
             all_entities[-1] = self.player
         elif self.__class__.group_touching[floor(self.group)] > 5:
             if self.switched_block:
@@ -756,6 +787,23 @@ class Movable_Tile(Entity):
             else:
                 self.entity.entities[idx].collided.append(self)
 
+    def coarse_tick(self, frames):
+        """Moves along the path for the frames it is behind at once, without collisions unless something rides it"""
+        if self.destroyed:
+            return None
+        self.update_draw_pos()
+        around = self.rect.inflate(self.tile_size * 2, self.tile_size * 2)
+        self.far = not any(around.colliderect(entity.rect) for entity in self.entity.query_rect(
+            around.move(self.camera_x, self.camera_y), Collidable_Entity, ordered=False).values())
+        for _ in range(frames):
+            self.update_draw_pos()
+            if self.far:
+                self.frame += 0.01
+                self.check_tick()
+            else:
+                self.run()
+        self.far = False
+
     def update_touch(self):
         """When the player touches the movable tile"""
         if self.pta:
@@ -960,9 +1008,22 @@ class Movable_Tile(Entity):
             y += 4 + text_rect.height
 
     def update_path_in_idx(self):
-        """Updates path in idx when path is changed"""
+        """Updates path in idx and compiles the waypoints of every tile along the path when path is changed"""
         self.path_in_idx = self.path.replace('>', ',').replace('<', ',').replace('^', ',').replace('v', ',')
         self.path_in_idx = [int(v) for v in self.path_in_idx.split(',')]
+        self.path_nodes = set(self.path_in_idx)
+        self.waypoint_height = self.tiles.grid_height
+        on_path = set(self.path_nodes)
+        for i, idx in enumerate(self.path_in_idx[:-1]):
+            end = self.path_in_idx[i + 1]
+            direction = self.path[self.path.find(str(idx)) + len(str(idx))]
+            step = {'>': self.tiles.grid_height, '<': -self.tiles.grid_height, '^': 1, 'v': -1}.get(direction, 0)
+            for _ in range(abs(end - idx) if step else 0):
+                idx += step
+                if idx == end:
+                    break
+                on_path.add(idx)
+        self.waypoints = {tile_idx: self.find_waypoint(tile_idx) for tile_idx in on_path}  # tile_idx: waypoint
 
     def convert_tile_idx_to_coords(self, tile_idx) -> tuple[int, int]:
         """Converts tile index to coordinates"""
@@ -1165,15 +1226,15 @@ class Collidable_Entity(Entity):
             return False
         if tile.alpha == 0 and not fix_dy < 0:
             return False
-        if (fix_dx < 0 and tile.collision in '/1 \\0') or (fix_dx > 0 and tile.collision in '\\1 /0'):
+        if (fix_dx < 0 and tile.flags & PASS_LEFT) or (fix_dx > 0 and tile.flags & PASS_RIGHT):
             pass
-        elif '\\' in tile.collision or '/' in tile.collision:
-            m = -1 if '/' in tile.collision else 1  # gradient
-            c = self.tile_size if '/' in tile.collision else 0  # y-intercept
+        elif tile.flags & SLOPE:
+            m = tile.slope  # gradient
+            c = self.tile_size if m < 0 else 0  # y-intercept
             offset_y = mod_y - (m * mod_x + c)  # Linear equation
             if tile.layer == 2:
                 return False
-            if '0' in tile.collision:
+            if tile.flags & SLOPE_CEILING:
                 if offset_y >= 0:
                     return False
                 elif fix_dy > 0:
@@ -1181,7 +1242,7 @@ class Collidable_Entity(Entity):
                 else:
                     self.y += self.tile_size - offset_y
                     return True
-            elif '1' in tile.collision:
+            elif tile.flags & SLOPE_FLOOR:
                 self.rotation = 45 * m * -1
                 if offset_y <= 0:
                     return False
@@ -1190,11 +1251,11 @@ class Collidable_Entity(Entity):
                 else:
                     self.y -= offset_y
                     return True
-        if '-' in tile.collision:
+        if tile.flags & PLATFORM:
             if mod_y - fix_dy > 1 or not feet:
                 return False
 
-        if '~' in tile.collision:
+        if tile.flags & WATER:
             if 280 <= tile.idx <= 282:
                 self.bounce_on_mystery()
             if not self.swim:
@@ -1203,7 +1264,7 @@ class Collidable_Entity(Entity):
         elif self.swim:
             self.x_vel /= 0.2
             self.swim = False
-        if '=' in tile.collision or '_' in tile.collision or '>' in tile.collision or '<' in tile.collision:
+        if tile.flags & GAP:
             dx, dy = tile.col_width, tile.col_height
             if self.y_vel > 21 and dy * -1 > 20:
                 return False
@@ -1223,7 +1284,7 @@ class Collidable_Entity(Entity):
                 if mod_x - 5 < dx and -self.x_vel > safe_speed:
                     self.x_vel = -safe_speed
                 return False
-        if self.rotation != 0 and feet and not ('\\' in tile.collision or '/' in tile.collision):
+        if self.rotation != 0 and feet and not tile.flags & SLOPE:
             self.rotation = 0
         # To account for slopes, 0.000001 is added after the mod instead of a higher value
         if fix_dy > 0:
@@ -1238,20 +1299,85 @@ class Collidable_Entity(Entity):
         return True
 
 
+class Entity_Frame:
+    """One entity image, decoded when first used, the flipped image is only made once it is needed"""
+    __slots__ = 'file', 'surfaces'
+
+    def __init__(self, file):
+        self.file = file
+        self.surfaces = [None, None]  # Image, flipped image
+
+    def __getitem__(self, flipped) -> py.Surface:
+        """0 for the image and 1 for the flipped image, like the old {0: image, 1: flipped image} dictionaries"""
+        surface = self.surfaces[flipped]
+        if surface is None:
+            if self.surfaces[0] is None:
+                self.surfaces[0] = load(self.file)
+            if flipped:
+                self.surfaces[1] = flip(self.surfaces[0])
+            surface = self.surfaces[flipped]
+        return surface
+
+
 class Entity_Img:
     """Class storing basic entity properties"""
+    max_sprites = 512
+    use_atlas = False  # Decodes every image at once and packs them into atlas surfaces
+    atlas_size = 1024
 
     def __init__(self, path):
-        """Stores all images into a dictionary"""
+        """Stores all images into a dictionary, they are only decoded when first used"""
         self.path = path
         self.image = {}
         i = 0
         for paths in ["Items", "Entity_Art", "Doors", "Laser_Tiles", "Particles"]:
             file_path = join(path, paths)
-            self.images = [f for f in sorted(listdir(file_path)) if isfile(join(file_path, f))]
-            for image in self.images:
-                self.image[i] = {0: load(join(file_path, image)), 1: flip(load(join(file_path, image)))}
+            for image in (f for f in sorted(listdir(file_path)) if isfile(join(file_path, f))):
+                self.image[i] = Entity_Frame(join(file_path, image))
                 i += 1
+        self.index_of = {id(images): i for i, images in self.image.items()}  # Entity.image -> image index
+        self.sprites = OrderedDict()  # Least recently drawn sprites come first
+        self.atlases = []
+        if self.use_atlas:
+            self.pack_atlas()
+
+    def pack_atlas(self):
+        """Packs the images into shelves of a few atlas surfaces, each image becomes an area of its atlas"""
+        size = self.atlas_size
+        x, y, shelf_height = size, 0, 0
+        for frame in sorted(self.image.values(), key=lambda f: f[0].get_height(), reverse=True):
+            width, height = frame[0].get_size()
+            if width > size or height > size:
+                continue
+            if x + width > size:  # Next shelf
+                x, y, shelf_height = 0, y + shelf_height, 0
+            if not self.atlases or y + height > size:
+                self.atlases.append(py.Surface((size, size), py.SRCALPHA).convert_alpha())
+                x, y, shelf_height = 0, 0, 0
+            # Max blending onto the empty atlas copies the pixels, alpha included
+            self.atlases[-1].blit(frame[0], (x, y), special_flags=py.BLEND_RGBA_MAX)
+            frame.surfaces[0] = self.atlases[-1].subsurface((x, y, width, height))
+            x += width
+            shelf_height = max(shelf_height, height)
+
+    def get_sprite(self, index: int, direction: bool, size: tuple, rotation=0, alpha=255):
+        """Returns the scaled, rotated and faded image of an entity, rotation is rounded to the nearest degree"""
+        key = (index, direction, size, round(rotation) % 360, alpha)
+        sprites = self.sprites
+        if key in sprites:
+            sprites.move_to_end(key)
+            return sprites[key]
+        if alpha != 255:
+            image = self.get_sprite(index, direction, size, rotation).copy()
+            image.set_alpha(alpha)
+        elif key[3] != 0:
+            image = py.transform.rotate(self.get_sprite(index, direction, size), key[3])
+        else:
+            image = py.transform.scale(self.image[index][0 if direction else 1], size)
+        sprites[key] = image
+        if len(sprites) > self.max_sprites:
+            sprites.popitem(last=False)
+        return image
 
 
 def load(loc):
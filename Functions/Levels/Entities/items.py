@@ -383,8 +383,8 @@ class Laser_Switch(Entity):
         self.l_switched = self.default
         self.image = self.images[0 if not self.l_switched else 1]
         col_dict = {34: 'b', 36: 'g', 38: 'r', 40: 'y'}
-        self.targets = {k: v for k, v in self.entity.entities.items() if v.__class__.__name__ == 'Laser_Shooter'}
-        self.targets = {k: v for k, v in self.targets.items() if v.col == col_dict[self.idx]}
+        self.targets = {k: v for k, v in self.entity.registries['laser_shooters'].items()
+                        if v.col == col_dict[self.idx]}
         self.toggle_lasers()
 
     def draw_edit_menu(self):
@@ -0,0 +1,150 @@
+from array import array
+from sys import byteorder
+import re
+import zlib
+try:
+    from .level_grid import Level_Grid
+except ImportError:
+    from level_grid import Level_Grid
+
+"""Compact binary level format, stored in the data column of the levels table
+Layout: magic, version, flags, then the (optionally zlib compressed) body of
+    width, height, palette size, palette of float64 tile values,
+    run count, (palette index, length) runs of the tile grid in tile index order,
+    overlap count, (tile index delta, palette index) pairs, entity count, (tile index delta, palette index) pairs
+All counts, lengths and indexes are unsigned LEB128 varints, tile index deltas are zigzag so any order is kept"""
+
+MAGIC = b'ALV'
+VERSION = 1
+ZLIB = 1  # Flag bit, the body is zlib compressed
+LONG_VARINTS = re.compile(rb'[\x80-\xff]+[\x00-\x7f]')  # Most values fit in one byte and are read in bulk
+
+
+def is_binary(data) -> bool:
+    """Tells the binary format apart from the legacy text columns"""
+    return isinstance(data, bytes) and data[:3] == MAGIC
+
+
+def write_varint(out: bytearray, value: int):
+    """Appends an unsigned LEB128 varint"""
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varints(data, start: int) -> list:
+    """Reads every varint from start to the end of data, one byte varints are copied across in bulk"""
+    values = []
+    for match in LONG_VARINTS.finditer(data, start):
+        values += data[start:match.start()]
+        value = shift = 0
+        for byte in match.group():
+            value |= (byte & 0x7f) << shift
+            shift += 7
+        values.append(value)
+        start = match.end()
+    values += data[start:]
+    return values
+
+
+def zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def encode_level(width: int, height: int, tile_grid, overlaps: dict, entities: dict, compress=True) -> bytes:
+    """Encodes the level layers, compress only keeps the zlib body when it is smaller"""
+    palette = {}
+    runs = []
+    tile, length = None, 0
+    for tile_idx in range(width * height):
+        if tile_grid[tile_idx] == tile:
+            length += 1
+        else:
+            if length:
+                runs.append((palette.setdefault(tile, len(palette)), length))
+            tile, length = tile_grid[tile_idx], 1
+    if length:
+        runs.append((palette.setdefault(tile, len(palette)), length))
+
+    layers = []
+    for layer in (overlaps, entities):
+        pairs, last = [], 0
+        for tile_idx, tile in layer.items():
+            pairs.append((zigzag(int(tile_idx) - last), palette.setdefault(float(tile), len(palette))))
+            last = int(tile_idx)
+        layers.append(pairs)
+
+    values = array('d', palette)
+    if byteorder == 'big':
+        values.byteswap()
+    body = bytearray()
+    for value in (width, height, len(palette)):
+        write_varint(body, value)
+    body += values.tobytes()
+    for pairs in (runs, *layers):
+        write_varint(body, len(pairs))
+        for first, second in pairs:
+            write_varint(body, first)
+            write_varint(body, second)
+
+    flags = 0
+    if compress:
+        packed = zlib.compress(body, 9)
+        if len(packed) < len(body):
+            body, flags = packed, ZLIB
+    return MAGIC + bytes((VERSION, flags)) + bytes(body)
+
+
+def decode_level(data: bytes):
+    """Returns grid_width, grid_height, tile_grid, overlaps, entities"""
+    if not is_binary(data):
+        raise ValueError('Not a binary level')
+    if data[3] != VERSION:
+        raise ValueError(f'Unknown level format version {data[3]}')
+    body = zlib.decompress(data[5:]) if data[4] & ZLIB else data[5:]
+
+    # The palette sits between varints, so read the three before it first
+    head, idx = [], 0
+    while len(head) < 3:
+        value = shift = 0
+        while body[idx] & 0x80:
+            value |= (body[idx] & 0x7f) << shift
+            shift += 7
+            idx += 1
+        head.append(value | body[idx] << shift)
+        idx += 1
+    width, height, palette_size = head
+    palette = array('d')
+    palette.frombytes(body[idx:idx + palette_size * 8])
+    if byteorder == 'big':
+        palette.byteswap()
+    values = read_varints(body, idx + palette_size * 8)
+
+    # Runs are repeated as float32 bytes and joined, so the grid is built without a loop over its cells
+    tile_bytes = array('f', palette).tobytes()
+    tile_bytes = [tile_bytes[idx:idx + 4] for idx in range(0, len(tile_bytes), 4)]
+    run_end = 1 + values[0] * 2
+    cells = array('f')
+    cells.frombytes(b''.join([tile_bytes[tile] * length for tile, length in zip(values[1:run_end:2],
+                                                                                 values[2:run_end:2])]))
+    if len(cells) < width * height:
+        cells += array('f', (-2.0,)) * (width * height - len(cells))
+    tile_grid = Level_Grid(cells)
+    layers = []
+    read_idx = run_end
+    for _ in range(2):
+        count = values[read_idx]
+        read_idx += 1
+        layer, tile_idx = {}, 0
+        for delta, tile in zip(values[read_idx:read_idx + count * 2:2], values[read_idx + 1:read_idx + count * 2:2]):
+            tile_idx += unzigzag(delta)
+            layer[tile_idx] = palette[tile]
+        layers.append(layer)
+        read_idx += count * 2
+    return width, height, tile_grid, layers[0], layers[1]
+
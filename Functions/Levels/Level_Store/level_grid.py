@@ -0,0 +1,80 @@
+from array import array
+
+"""This file stores level tile grids compactly, the tile index of a tile is still y + x * grid_height"""
+
+
+class Level_Grid:
+    """Level tile grid backed by a float array, works like the old {tile_idx: tile} dictionaries"""
+    __slots__ = 'cells'
+
+    def __init__(self, cells=None):
+        """Tile grid values"""
+        self.cells = array('f') if cells is None else cells
+
+    @classmethod
+    def from_runs(cls, runs, size: int, fill=-2.0):
+        """Builds a grid from (tile, length) runs in one go, filling any cells left over"""
+        cells = array('f')
+        runs = tuple(runs)
+        if runs:
+            tiles, lengths = zip(*runs)
+            packed = {tile: array('f', (tile,)).tobytes() for tile in set(tiles)}
+            cells.frombytes(b''.join(map(bytes.__mul__, map(packed.__getitem__, tiles), lengths)))
+        if len(cells) < size:
+            cells += array('f', (fill,)) * (size - len(cells))
+        return cls(cells)
+
+    def __getitem__(self, tile_idx):
+        if 0 <= tile_idx < len(self.cells):
+            return self.cells[tile_idx]
+        raise KeyError(tile_idx)
+
+    def __setitem__(self, tile_idx, tile):
+        if 0 <= tile_idx < len(self.cells):
+            self.cells[tile_idx] = tile
+        elif tile_idx == len(self.cells):  # Adding columns to the level
+            self.cells.append(tile)
+        else:
+            raise KeyError(tile_idx)
+
+    def __delitem__(self, tile_idx):
+        """Only the end of the grid can be removed, as removing columns"""
+        if isinstance(tile_idx, slice):
+            del self.cells[tile_idx]
+        elif tile_idx == len(self.cells) - 1:
+            self.cells.pop()
+        else:
+            raise KeyError(tile_idx)
+
+    def __contains__(self, tile_idx):
+        return isinstance(tile_idx, int) and 0 <= tile_idx < len(self.cells)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __iter__(self):
+        return iter(range(len(self.cells)))
+
+    def keys(self):
+        return range(len(self.cells))
+
+    def values(self):
+        return iter(self.cells)
+
+    def items(self):
+        return enumerate(self.cells)
+
+    def copy(self):
+        return Level_Grid(self.cells[:])
+
+    def get(self, tile_idx, default=None):
+        if 0 <= tile_idx < len(self.cells):
+            return self.cells[tile_idx]
+        return default
+
+
+if __name__ == '__main__':
+    grid = Level_Grid.from_runs(((28.0, 3), (-1.0, 26), (19.5, 1)), 40)
+    old_grid = {key: value for key, value in enumerate([28.0] * 3 + [-1.0] * 26 + [19.5] + [-2.0] * 10)}
+    assert dict(grid.items()) == old_grid
+    print(f'{len(grid)} tiles, {grid.cells.itemsize * len(grid)} bytes')
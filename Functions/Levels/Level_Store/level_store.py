@@ -1,53 +1,138 @@
-from os.path import join
+from os.path import join, dirname, abspath, getsize
+from collections import OrderedDict
+from threading import Thread, RLock
+from queue import SimpleQueue
 import sqlite3
+import re
+try:
+    from .level_grid import Level_Grid
+    from .level_codec import encode_level, decode_level
+except ImportError:
+    from level_grid import Level_Grid
+    from level_codec import encode_level, decode_level
+
+# Binary levels keep their tile grid, overlaps and entities in data, and leave the level, overlaps and entities empty
+LEVEL_TABLE = "(level_id TEXT PRIMARY KEY, level TEXT, overlaps TEXT, entities TEXT, time INTEGER, camera TEXT, " \
+              "background TEXT, data BLOB)"
+# Legacy text grids are 1_width_height_ then runs of a tile number (empty for air) and a length letter
+LEGACY_TOKENS = re.compile(r'([\d.]*)([^\d.])')
+LEGACY_PAIRS = re.compile(r'([^,:]*):([^,]*)')  # Overlaps and entities are ,tile_idx:tile pairs
+
+
+def read_legacy_layer(text: str) -> dict:
+    """Reads legacy ,tile_idx:tile pairs into {tile_idx: tile}"""
+    pairs = LEGACY_PAIRS.findall(text)
+    if not pairs:
+        return {}
+    tile_idxs, tiles = zip(*pairs)
+    return dict(zip(map(int, tile_idxs), map(float, tiles)))
 
 
 class Database:
     """Level Database Functions"""
-    __slots__ = 'path', 'con', 'cur'
+    __slots__ = 'path', 'con', 'cur', 'db_lock'
 
     def __init__(self, path):
         """Connect to Database"""
         self.path = path
         self.con, self.cur = None, None
+        # Levels are also loaded from the level loading screen thread, so the cursor is only used under this lock
+        self.db_lock = RLock()
 
     def setup_database(self, db):
         """Setups Database"""
         db = db.split(' ')
         db = '_'.join(db)
-        self.con = sqlite3.connect(join(self.path, 'Data', 'Planets', f'{db}.db'))
-        self.cur = self.con.cursor()
+        with self.db_lock:
+            self.con = sqlite3.connect(join(self.path, 'Data', 'Planets', f'{db}.db'), check_same_thread=False)
+            self.cur = self.con.cursor()
 
-        # Level Table
-        try:
-            self.cur.execute("CREATE TABLE levels (level_id TEXT, level TEXT, overlaps TEXT, entities TEXT, "
-                             "time INTEGER, camera TEXT, background TEXT)")
-        except sqlite3.OperationalError:
-            pass
-        else:
-            self.add_level('', '', '', '', 500, '', '')
+            # Level Table
+            try:
+                self.cur.execute(f"CREATE TABLE levels {LEVEL_TABLE}")
+            except sqlite3.OperationalError:
+                self.migrate_database()
+            else:
+                self.add_level('', '', '', '', 500, '', '')
+
+    def migrate_database(self):
+        """Rebuilds old level tables without a key so level_id is the primary key, the last row of an id wins,
+        and adds the binary data column. This rewrites the planet's database file the first time it is opened"""
+        with self.db_lock:
+            columns = {name: pk for _, name, _, _, _, pk in self.cur.execute("PRAGMA table_info(levels)").fetchall()}
+            if any(columns.values()) and 'data' in columns:
+                return
+            try:
+                self.cur.execute("BEGIN")
+                if any(columns.values()):
+                    self.cur.execute("ALTER TABLE levels ADD COLUMN data BLOB")
+                else:
+                    self.cur.execute(f"CREATE TABLE levels_keyed {LEVEL_TABLE}")
+                    self.cur.execute("INSERT OR REPLACE INTO levels_keyed (level_id, level, overlaps, entities, time, "
+                                     "camera, background) SELECT level_id, level, overlaps, entities, time, camera, "
+                                     "background FROM levels ORDER BY oid")
+                    self.cur.execute("DROP TABLE levels")
+                    self.cur.execute("ALTER TABLE levels_keyed RENAME TO levels")
+            except sqlite3.Error:
+                self.con.rollback()
+                raise
+            self.con.commit()
 
     def add_level(self, level_id, level_code, overlaps, entity_code, time: int, camera, background):
         """Adds new level to the database"""
-        self.cur.execute("INSERT INTO levels VALUES (:level_id, :level_code, :lap, :entity, :time, :camera, :bg)",
-                         {'level_id': level_id, 'level_code': level_code, 'lap': overlaps, 'entity': entity_code,
-                          'time': time, 'camera': camera, 'bg': background})
-        self.con.commit()
+        with self.db_lock:
+            self.cur.execute("INSERT INTO levels VALUES (:level_id, :level_code, :lap, :entity, :time, :camera, :bg, "
+                             "NULL)",
+                             {'level_id': level_id, 'level_code': level_code, 'lap': overlaps, 'entity': entity_code,
+                              'time': time, 'camera': camera, 'bg': background})
+            self.con.commit()
+
+    def upsert_levels(self, levels):
+        """Inserts or updates (level_id, level, overlaps, entities, time, camera, background, data) rows in one
+        commit"""
+        with self.db_lock, self.con:
+            self.cur.executemany("INSERT INTO levels VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(level_id) DO UPDATE "
+                                 "SET level = excluded.level, overlaps = excluded.overlaps, "
+                                 "entities = excluded.entities, time = excluded.time, camera = excluded.camera, "
+                                 "background = excluded.background, data = excluded.data", levels)
+
+    def get_level_ids(self):
+        """Returns every level id in saved order"""
+        with self.db_lock:
+            self.cur.execute("SELECT level_id FROM levels ORDER BY oid")
+            return [level_id for level_id, in self.cur.fetchall()]
+
+    def has_binary_levels(self) -> bool:
+        """Checks if any level was saved in the binary format"""
+        with self.db_lock:
+            self.cur.execute("SELECT 1 FROM levels WHERE data IS NOT NULL LIMIT 1")
+            return self.cur.fetchone() is not None
+
+    def get_level(self, level_id):
+        """Returns the level, overlaps, entities, time, camera, background and data of one level"""
+        with self.db_lock:
+            self.cur.execute("SELECT level, overlaps, entities, time, camera, background, data FROM levels "
+                             "WHERE level_id = ?", (level_id,))
+            return self.cur.fetchone()
 
     def get_all_levels(self):
         """Returns all level codes"""
-        self.cur.execute("SELECT *, oid FROM levels")
-        return self.cur.fetchall()
+        with self.db_lock:
+            self.cur.execute("SELECT level_id, level, overlaps, entities, time, camera, background, data, oid "
+                             "FROM levels")
+            return self.cur.fetchall()
 
     def delete_all(self):
         """Deletes all from levels"""
-        self.cur.execute("DELETE from levels")
-        self.con.commit()
+        with self.db_lock:
+            self.cur.execute("DELETE from levels")
+            self.con.commit()
 
 
 class Level_Store(Database):
     """Class for sorting levels and database reading"""
-    __slots__ = 'encoded', 'letter', 'read_idx', 'value', 'levels', 'a_to_z', 'z_to_a'
+    __slots__ = 'encoded', 'letter', 'read_idx', 'value', 'levels', 'dirty', 'binary', 'decoded', 'cache_size', \
+        'lock', 'pending', 'generation', 'queue', 'worker', 'a_to_z', 'z_to_a'
 
     def __init__(self, path):
         super().__init__(path)
@@ -56,6 +141,19 @@ class Level_Store(Database):
         self.read_idx = 0
         self.value = ''
         self.levels = None
+        self.dirty = set()  # Level ids changed since they were last written
+        # Saves levels in the binary format, older builds can only read the legacy text columns. Only planets
+        # converted on purpose with convert_levels are saved in it, see setup_levels
+        self.binary = False
+        self.decoded = OrderedDict()  # Least recently loaded first, level id: load_level results
+        self.cache_size = 8
+
+        # Levels the player may enter next are decoded on a worker thread, see prefetch_levels
+        self.lock = RLock()  # Guards levels, dirty, decoded and pending between the threads
+        self.pending = set()  # Level ids queued for the worker, dropped when the level is saved or loaded first
+        self.generation = 0  # Counts setup_levels calls, worker results from another planet are thrown away
+        self.queue = SimpleQueue()
+        self.worker = None
 
         self.a_to_z = {1: 'a', 2: 'b', 3: 'c', 4: 'd', 5: 'e', 6: 'f', 7: 'g', 8: 'h', 9: 'i', 10: 'j', 11: 'k',
                        12: 'l', 13: 'm', 14: 'n', 15: 'o', 16: 'p', 17: 'q', 18: 'r', 19: 's', 20: 't', 21: 'u',
@@ -63,8 +161,41 @@ class Level_Store(Database):
         self.z_to_a = {key: value for value, key in self.a_to_z.items()}
 
     def setup_levels(self):
-        self.levels = {key: {'level': level, 'overlaps': lap, 'entities': ent, 'time': int(t), 'camera': c, 'bg': bg}
-                       for key, level, lap, ent, t, c, bg, _ in self.get_all_levels()}
+        """Lists the level ids, rows are only fetched when a level is loaded"""
+        levels = dict.fromkeys(self.get_level_ids())
+        self.binary = self.has_binary_levels()
+        with self.lock:
+            self.levels = levels
+            self.dirty.clear()
+            self.decoded.clear()
+            self.pending.clear()
+            self.generation += 1
+
+    def fetch_row(self, level):
+        """Reads the saved row of a level"""
+        level_code, lap, ent, t, c, bg, data = self.get_level(level)
+        return {'level': level_code, 'overlaps': lap, 'entities': ent, 'time': int(t), 'camera': c, 'bg': bg,
+                'data': data}
+
+    def get_row(self, level):
+        """Fetches the saved row of a level the first time it is needed"""
+        with self.lock:
+            if self.levels[level] is None:
+                self.levels[level] = self.fetch_row(level)
+            return self.levels[level]
+
+    def write_dirty_levels(self):
+        """Writes only the levels changed since the last write"""
+        with self.lock:
+            if not self.dirty:
+                return
+            self.upsert_levels([(level, self.levels[level]['level'], self.levels[level]['overlaps'],
+                                 self.levels[level]['entities'], self.levels[level]['time'],
+                                 self.levels[level]['camera'], self.levels[level]['bg'], self.levels[level]['data'])
+                                for level in self.dirty])
+            for level in self.dirty:
+                self.levels[level] = None  # Fetched again if needed
+            self.dirty.clear()
 
     def write_value_with_delimiter(self, value, delimiter: str):
         """writes the value with the delimiter into the str list"""
@@ -92,8 +223,29 @@ class Level_Store(Database):
     def save_level(self, level_name, level_width, level_height, level_tile_grid, overlaps, entity_grid, time, boxes,
                    background):
         """Saves the level given to the Database"""
-        if level_name not in self.levels:
-            self.levels[level_name] = {'level': '', 'overlaps': '', 'entities': '', 'time': '', 'camera': '', 'bg': ''}
+        camera = ','.join([data for data in boxes])
+
+        backgrounds = '|'.join([str(item) for item in (background[0], background[1])]) + '|'
+        for key, value in background[2].items():
+            backgrounds += ':'.join([str(key), str(value)]) + ','
+
+        with self.lock:
+            # Every column is written again, so the old row is not fetched
+            self.levels[level_name] = {'level': '', 'overlaps': '', 'entities': '', 'time': time, 'camera': camera,
+                                       'bg': backgrounds, 'data': None}
+            self.decoded.pop(level_name, None)
+            self.pending.discard(level_name)
+            self.write_layers(level_name, level_width, level_height, level_tile_grid, overlaps, entity_grid)
+            self.dirty.add(level_name)
+            self.write_dirty_levels()
+
+    def write_layers(self, level_name, level_width, level_height, level_tile_grid, overlaps, entity_grid):
+        """Encodes the tile grid, overlaps and entities in the binary or legacy text format"""
+        if self.binary:
+            self.levels[level_name].update(level='', overlaps='', entities='', data=encode_level(
+                level_width, level_height, level_tile_grid, overlaps, entity_grid))
+            return
+        self.levels[level_name]['data'] = None
         self.encoded = ''
         self.write_value_with_delimiter(1, '_')
         self.write_value_with_delimiter(level_width, '_')
@@ -125,59 +277,123 @@ class Level_Store(Database):
             entities = ','.join([entities, ':'.join([str(e_idx), str(e_tile_idx)])])
         self.levels[level_name]['entities'] = entities
 
-        self.levels[level_name]['time'] = time
+    def read_legacy_runs(self, encoded: str):
+        """Splits a legacy text grid into its width, height and (tile, length) runs in one regex pass"""
+        tokens = LEGACY_TOKENS.findall(encoded)
+        if not tokens or tokens[0][0] != '1':
+            return 0, 0, None
+        values, letters = zip(*tokens[3:]) if len(tokens) > 3 else ((), ())
+        tiles = {value: float(value or -1) for value in set(values)}
+        return int(tokens[1][0]), int(tokens[2][0]), list(zip(map(tiles.__getitem__, values),
+                                                              map(self.z_to_a.__getitem__, letters)))
 
-        camera = ','.join([data for data in boxes])
-        self.levels[level_name]['camera'] = camera
+    def walk_legacy_runs(self, encoded: str):
+        """Reads the legacy text grid a letter at a time as levels used to be, kept to check read_legacy_runs"""
+        self.encoded = encoded
+        self.read_idx = 0
+        self.read_value()
+        if self.value != '1':
+            return 0, 0, None
+        self.read_value()
+        grid_width = int(self.value)
+        self.read_value()
+        grid_height = int(self.value)
+        runs = []
+        while self.read_idx < len(self.encoded):
+            self.read_value()
+            if self.value == '':
+                self.value = -1
+            runs.append((float(self.value), self.z_to_a[self.letter]))
+        return grid_width, grid_height, runs
 
-        backgrounds = '|'.join([str(item) for item in (background[0], background[1])]) + '|'
-        for key, value in background[2].items():
-            backgrounds += ':'.join([str(key), str(value)]) + ','
-        self.levels[level_name]['bg'] = backgrounds
+    def read_layers(self, level: str):
+        """Decodes the tile grid, overlaps and entities from whichever format the level is saved in"""
+        return self.decode_layers(self.get_row(level))
 
-        self.delete_all()
-        for level in self.levels:
-            self.add_level(level, self.levels[level]['level'], self.levels[level]['overlaps'],
-                           self.levels[level]['entities'], self.levels[level]['time'], self.levels[level]['camera'],
-                           self.levels[level]['bg'])
+    def decode_layers(self, row: dict):
+        """Decodes the tile grid, overlaps and entities of a row, safe to call from the prefetch worker"""
+        if row['data']:
+            return decode_level(row['data'])
+        grid_width, grid_height, runs = self.read_legacy_runs(row['level'])
+        tile_grid = {} if runs is None else Level_Grid.from_runs(runs, grid_width * grid_height)
+        overlaps = read_legacy_layer(row['overlaps'])
+        entities = read_legacy_layer(row['entities'])
+        return grid_width, grid_height, tile_grid, overlaps, entities
 
     def load_level(self, level: str):
-        if level not in self.levels:
-            return 0, 0, {}, {}, {}, 500, {}, {0: False, 1: False}
-        self.encoded = self.levels[level]['level']
-        self.read_idx = 0
-        self.read_value()
-        grid_width = 0
-        grid_height = 0
-        tile_grid = {}
-        if self.value == '1':
-            self.read_value()
-            grid_width = int(self.value)
-            self.read_value()
-            grid_height = int(self.value)
-            for tile in range(grid_width * grid_height):
-                tile_grid[tile] = -2
-            tile_idx = 0
-            while self.read_idx < len(self.encoded):
-                self.read_value()
-                if self.value == '':
-                    self.value = -1
-                for _ in range(self.z_to_a[self.letter]):
-                    tile_grid[tile_idx] = float(self.value)
-                    tile_idx += 1
-        overlaps = {int(o_idx): float(o_tile_idx) for o_idx, o_tile_idx in
-                    [o_tile.split(':') for o_tile in self.levels[level]['overlaps'].split(',') if o_tile != '']}
-        entities = {int(e_idx): float(e_tile_idx) for e_idx, e_tile_idx in
-                    [e_tile.split(':') for e_tile in self.levels[level]['entities'].split(',') if e_tile != '']}
+        """Returns a copy of the decoded level, recently loaded levels are kept decoded for respawns and retries"""
+        with self.lock:
+            if level not in self.levels:
+                return 0, 0, {}, {}, {}, 500, {}, {0: False, 1: False}
+            decoded = self.decoded.get(level)
+            if decoded is not None:
+                self.decoded.move_to_end(level)
+            self.pending.discard(level)  # A late worker result is not needed
+        if decoded is None:
+            decoded = self.decode_row(self.get_row(level))
+            with self.lock:
+                self.cache_level(level, decoded)
+        with self.lock:
+            if level not in self.dirty:
+                self.levels[level] = None  # The decoded level is kept instead of the row
+        grid_width, grid_height, tile_grid, overlaps, entities, time, camera, background = decoded
+        # Callers edit what they are given, so the cached level is never handed out
+        return grid_width, grid_height, tile_grid.copy(), overlaps.copy(), entities.copy(), time, \
+            {key: value.copy() for key, value in camera.items()}, {0: background[0], 1: background[1],
+                                                                   2: background[2].copy()}
+
+    def cache_level(self, level: str, decoded: tuple):
+        """Keeps a decoded level, forgetting the least recently loaded one past cache_size, needs the lock"""
+        self.decoded[level] = decoded
+        if len(self.decoded) > self.cache_size:
+            self.decoded.popitem(last=False)
+
+    def prefetch_levels(self, levels):
+        """Queues levels to be decoded on the worker thread, which is only given rows that are already read"""
+        if self.levels is None:
+            return
+        jobs = []
+        with self.lock:
+            for level in levels:
+                if level in self.levels and level not in self.decoded and level not in self.pending:
+                    self.pending.add(level)
+                    jobs.append((self.generation, level, self.levels[level] or self.fetch_row(level)))
+        for job in jobs:
+            self.queue.put(job)
+        if jobs and self.worker is None:
+            self.worker = Thread(target=self.prefetch_worker, daemon=True)
+            self.worker.start()
+
+    def prefetch_worker(self):
+        """Decodes queued levels into the cache until None is queued"""
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            generation, level, row = job
+            try:
+                decoded = self.decode_row(row)
+            except (ValueError, KeyError, IndexError):
+                decoded = None  # Left for load_level to raise on the main thread
+            with self.lock:
+                if generation != self.generation:
+                    continue  # Queued before another planet was set up, its level ids may be reused
+                if level in self.pending and decoded is not None:  # Otherwise saved or loaded while it was decoded
+                    self.cache_level(level, decoded)
+                self.pending.discard(level)
+
+    def decode_row(self, row: dict):
+        """Decodes every part of the level"""
+        grid_width, grid_height, tile_grid, overlaps, entities = self.decode_layers(row)
 
         camera = {}
-        for data in self.levels[level]['camera'].split(','):
+        for data in row['camera'].split(','):
             if not data:
                 continue
             data = data.split(':')
             camera[data[0]] = data[1].split('|')
 
-        bg = self.levels[level]['bg'].split('|')
+        bg = row['bg'].split('|')
         if bg[0]:
             if bg[0].isdigit():
                 background = int(bg[0])
@@ -208,14 +424,53 @@ class Level_Store(Database):
                 # {tile_idx: info, ...}
                 all_entity_info[int(entity[0])] = entity[1]
 
-        return grid_width, grid_height, tile_grid, overlaps, entities, self.levels[level]['time'], camera, \
+        return grid_width, grid_height, tile_grid, overlaps, entities, row['time'], camera, \
             {0: background, 1: show_credits, 2: all_entity_info}
 
+    def convert_levels(self, binary=True) -> int:
+        """Rewrites every saved level in the binary or legacy text format, returns how many changed"""
+        self.binary = binary
+        for level in self.levels:
+            row = self.get_row(level)
+            if bool(row['data']) == binary or not (row['data'] or row['level']):
+                self.levels[level] = None
+                continue
+            self.write_layers(level, *self.read_layers(level))
+            self.dirty.add(level)
+        converted = len(self.dirty)
+        self.write_dirty_levels()
+        return converted
+
     def close(self):
         """Closes Database and save changes"""
-        self.delete_all()
-        for level in self.levels:
-            self.add_level(level, self.levels[level]['level'], self.levels[level]['overlaps'],
-                           self.levels[level]['entities'], self.levels[level]['time'], self.levels[level]['camera'],
-                           self.levels[level]['bg'])
-        self.con.close()
+        if self.worker is not None:
+            self.queue.put(None)
+            self.worker = None
+        if self.levels is not None:
+            self.write_dirty_levels()
+        with self.db_lock:
+            self.con.close()
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    from glob import glob
+    from os.path import basename, splitext
+
+    PATH = dirname(dirname(dirname(abspath(__file__))))
+    planets = sorted(splitext(basename(f))[0] for f in glob(join(PATH, 'Data', 'Planets', '*.db')))
+    parser = ArgumentParser(description='Converts the levels of planet databases between the level formats')
+    parser.add_argument('planets', nargs='*', help=f'Any of {", ".join(planets)}, all of them when none are given')
+    parser.add_argument('--legacy', action='store_true', help='Converts back to the legacy text format')
+    args = parser.parse_args()
+
+    for planet in args.planets or planets:
+        file = join(PATH, 'Data', 'Planets', f'{planet}.db')
+        size = getsize(file)
+        store = Level_Store(PATH)
+        store.setup_database(planet)
+        store.setup_levels()
+        count = store.convert_levels(not args.legacy)
+        store.cur.execute("VACUUM")
+        store.close()
+        print(f'{planet}: {count} levels converted, {size} -> {getsize(file)} bytes')
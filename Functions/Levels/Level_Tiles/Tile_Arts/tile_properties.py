@@ -1,4 +1,6 @@
 import pygame as py
+from collections import OrderedDict
+from math import floor
 from os import listdir
 from os.path import isfile, join
 try:
@@ -8,11 +10,59 @@ except ImportError:
 
 """This file sorts out all tile costumes, collisions and properties"""
 
+# Collision flags, compiled once per tile index from the collision strings in tile_settings
+WATER = 1  # ~
+BLOCK = 1 << 1  # #
+SLOPE_UP = 1 << 2  # /
+SLOPE_DOWN = 1 << 3  # \
+PLATFORM = 1 << 4  # - (one way)
+WALL = 1 << 5  # |
+SLOPE_CEILING = 1 << 6  # 0 (solid above the slope)
+SLOPE_FLOOR = 1 << 7  # 1 (solid below the slope)
+GAP_LEFT = 1 << 8  # >
+GAP_RIGHT = 1 << 9  # <
+GAP_TOP = 1 << 10  # _
+GAP_BOTTOM = 1 << 11  # =
+SOLID = 1 << 12
+MEASURED = 1 << 13  # Needs col_width and col_height from the image
+PASS_LEFT = 1 << 14  # Slopes passed through when moving left
+PASS_RIGHT = 1 << 15  # Slopes passed through when moving right
+SLOPE = SLOPE_UP | SLOPE_DOWN
+GAP = GAP_LEFT | GAP_RIGHT | GAP_TOP | GAP_BOTTOM
+collision_chars = {'~': WATER, '#': BLOCK, '/': SLOPE_UP, '\\': SLOPE_DOWN, '-': PLATFORM, '|': WALL,
+                   '0': SLOPE_CEILING, '1': SLOPE_FLOOR, '>': GAP_LEFT, '<': GAP_RIGHT, '_': GAP_TOP, '=': GAP_BOTTOM}
+
+
+def compile_collision(collision: str) -> int:
+    """Compiles a collision string into collision flags"""
+    flags = 0
+    for char, flag in collision_chars.items():
+        if char in collision:
+            flags |= flag
+    if flags & WATER:
+        flags |= SOLID | (MEASURED if flags & GAP_TOP else 0)
+    elif flags & (BLOCK | SLOPE | PLATFORM | WALL):
+        flags |= SOLID | (MEASURED if flags & (SLOPE_CEILING | GAP_LEFT | GAP_RIGHT) else 0)
+    elif flags & GAP:
+        flags |= SOLID | MEASURED
+    if collision in '/1 \\0':
+        flags |= PASS_LEFT
+    if collision in '\\1 /0':
+        flags |= PASS_RIGHT
+    return flags
+
+
+def compile_slope(collision: str) -> int:
+    """Gradient of a slope collision, 0 if the tile is not a slope"""
+    if '/' in collision:
+        return -1
+    return 1 if '\\' in collision else 0
+
 
 class Tile_Index_Properties:
     """Class for tile properties (read-only)"""
     __slots__ = 'standard_tile_size', 'scale', 'image', 'blank', 'index', 'collision1', 'collision2', 'category', \
-                'img_width', 'img_height', 'tile_space'
+                'img_width', 'img_height', 'tile_space', 'flags1', 'flags2', 'slope1', 'slope2'
 
     def __init__(self, image, index: int):
         self.standard_tile_size = 32
@@ -35,6 +85,8 @@ class Tile_Index_Properties:
         else:
             self.collision2 = data[1]
             self.category = data[2]
+        self.flags1, self.flags2 = compile_collision(self.collision1), compile_collision(self.collision2)
+        self.slope1, self.slope2 = compile_slope(self.collision1), compile_slope(self.collision2)
         if len(data) > 3:
             self.img_width, self.img_height = data[2][0], data[2][1]
             self.tile_space = (data[3][0], data[3][1])
@@ -49,15 +101,38 @@ class Tile_Index_Properties:
                      (x, y))
 
 
+class Tile_Data:
+    """Read-only data shared by every tile with the same index and layer (flyweight)"""
+    __slots__ = 'index', 'layer', 'collision', 'flags', 'slope', 'category', 'image', 'tile_space', 'img_width', \
+                'img_height', 'scale'
+
+    def __init__(self, tile: Tile_Index_Properties, layer: int):
+        self.index = tile.index
+        self.layer = layer
+        if layer == 1:
+            self.collision, self.flags, self.slope = tile.collision1, tile.flags1, tile.slope1
+        else:
+            self.collision, self.flags, self.slope = tile.collision2, tile.flags2, tile.slope2
+        self.category = tile.category
+        self.image = tile.image
+        self.tile_space = tile.tile_space
+        self.img_width, self.img_height = tile.img_width, tile.img_height
+        self.scale = tile.standard_tile_size / 70
+
+
 class All_Tiles:
     """Class storing all tile values, loading all tile data"""
-    __slots__ = 'images', 'tile', 'img_count', 'path'
+    __slots__ = 'images', 'tile', 'img_count', 'path', 'surfaces', 'offsets', 'data'
+    max_surfaces = 512
 
     def __init__(self, path):
         """All tiles data"""
         self.images = []
         self.tile = {}
         self.img_count = 0
+        self.surfaces = OrderedDict()  # (index, dir, size, alpha): scaled surface, least recently drawn first
+        self.offsets = {}  # (index, gap flags, size): (mask, col_width, col_height)
+        self.data = {}  # Tile_Data of each index, a .5 index being layer 2
         for file in ("Tile_Arts", "Interactive", "Entities", "Particles"):
             self.path = join(path, file)
             self.images = [f for f in sorted(listdir(self.path)) if isfile(join(self.path, f))]
@@ -73,6 +148,45 @@ class All_Tiles:
             self.tile[self.img_count] = Tile_Index_Properties(image, self.img_count)
             self.img_count += 1
 
+    def get_data(self, idx: float):
+        """Returns the shared read-only data of a tile index"""
+        data = self.data.get(idx)
+        if data is None:
+            data = self.data[idx] = Tile_Data(self.tile[int(floor(idx))], 1 if idx == floor(idx) else 2)
+        return data
+
+    def get_image(self, index: int, direction: bool, size: tuple, alpha: int):
+        """Returns the scaled, flipped and faded surface of a tile, zooming and fading drop the least recent ones"""
+        key = (index, direction, size, alpha)
+        surfaces = self.surfaces
+        if key in surfaces:
+            surfaces.move_to_end(key)
+            return surfaces[key]
+        if alpha != 255:
+            image = self.get_image(index, direction, size, 255).copy()
+            image.set_alpha(alpha)
+        else:
+            image = self.tile[index].image
+            if not direction:
+                image = py.transform.flip(image, True, False)
+            image = py.transform.scale(image, size).convert_alpha()
+        surfaces[key] = image
+        if len(surfaces) > self.max_surfaces:
+            surfaces.popitem(last=False)
+        return image
+
+    def get_offsets(self, index: int, flags: int, size: tuple):
+        """Returns the collision mask and offsets of a tile, measuring it only once for every tile sharing it"""
+        key = (index, flags & (GAP_TOP | GAP_LEFT), size)
+        if key not in self.offsets:
+            mask = py.mask.from_surface(self.get_image(index, True, size, 255))
+            rect = mask.get_bounding_rects()[0]
+            col_height = -rect.y if flags & GAP_TOP else rect.height
+            col_width = -rect.x if flags & GAP_LEFT else rect.width
+            self.offsets[key] = (mask, col_width if abs(col_width) < 32 else 0,
+                                 col_height if abs(col_height) < 32 else 0)
+        return self.offsets[key]
+
 
 def load(loc):
     """Loads in images from a location"""
@@ -1,19 +1,18 @@
 import pygame as py
 from random import randint
-from math import floor, sin, radians
+from math import floor, ceil, sin, radians
 
 try:
-    from .Tile_Arts.tile_properties import All_Tiles
+    from .Tile_Arts.tile_properties import All_Tiles, WATER, SOLID, MEASURED
 except ImportError:
-    from Tile_Arts.tile_properties import All_Tiles
+    from Tile_Arts.tile_properties import All_Tiles, WATER, SOLID, MEASURED
 
 
 class Tile(py.sprite.Sprite):
     """Object Values for each Tile"""
     hide_hidden = True
-    __slots__ = 'x', 'y', 'idx', 'draw_x', 'draw_y', 'tiles_cls', 'tile_idx', 'idx', 'collision', 'layer', 'category', \
-                'image', 'tile_space', 'tile_placement', 'img_width', 'img_height', 'scale', 'bumped', 'mask', 'rect', \
-                'destroyed', 'col_width', 'col_height', 'alpha', 'solid', 'dir', 'flipped_img'
+    __slots__ = 'x', 'y', 'idx', 'draw_x', 'draw_y', 'tiles_cls', 'tile_idx', 'data', 'scale', 'bumped', 'mask', \
+                'rect', 'destroyed', 'col_width', 'col_height', 'alpha', 'solid', 'dir'
 
     def __init__(self, tiles_cls, x, y, idx, tile_idx, *, update=False):
         """Initializes Tile Variables"""
@@ -23,85 +22,73 @@ class Tile(py.sprite.Sprite):
             self.draw_x, self.draw_y = self.x, self.y
             self.tiles_cls, self.tile_idx = tiles_cls, tile_idx
 
-        idx = int(floor(idx))
-        if self.idx == float(idx):
-            self.collision = tiles_cls.tile[idx].collision1
-            self.layer = 1
-        else:
-            self.collision = tiles_cls.tile[idx].collision2
-            self.layer = 2
-        self.category = tiles_cls.tile[idx].category
-        self.image = tiles_cls.tile[idx].image
-        self.tile_space = tiles_cls.tile[idx].tile_space
-        self.tile_placement = tiles_cls.tile[idx].tile_space
-        self.img_width, self.img_height = tiles_cls.tile[idx].img_width, tiles_cls.tile[idx].img_height
-        self.scale = tiles_cls.tile[idx].standard_tile_size / 70
+        # Only the tile's position and state are stored, the rest is shared between tiles of the same index
+        self.data = tiles_cls.get_data(self.idx)
+        self.scale = self.data.scale
 
         self.bumped = None
         self.mask = None
         self.rect = None
         self.destroyed = False
         self.col_width, self.col_height = 0, 0
-        self.alpha = 255
-        if self.__class__.hide_hidden and str(idx) in '16 18 24 26':
-            self.alpha = 10 if str(idx) in '16 18' else 0  # Hidden Blocks
+        self.alpha = self.get_alpha(self.data.index)
         self.solid = False
         self.dir = True
-        if self.image:
-            self.flipped_img = py.transform.flip(self.image, True, False).convert_alpha()
-        else:
-            self.flipped_img = self.image
 
         self.update_collision()
 
+    # Read-only tile values
+    collision = property(lambda self: self.data.collision)
+    flags = property(lambda self: self.data.flags)
+    slope = property(lambda self: self.data.slope)
+    layer = property(lambda self: self.data.layer)
+    category = property(lambda self: self.data.category)
+    image = property(lambda self: self.data.image)
+    tile_space = property(lambda self: self.data.tile_space)
+    tile_placement = property(lambda self: self.data.tile_space)
+    img_width = property(lambda self: self.data.img_width)
+    img_height = property(lambda self: self.data.img_height)
+
+    @classmethod
+    def get_alpha(cls, idx):
+        """Gets the starting alpha of a tile index"""
+        if cls.hide_hidden and str(idx) in '16 18 24 26':
+            return 10 if str(idx) in '16 18' else 0  # Hidden Blocks
+        return 255
+
     def update_collision(self):
         """Updates the collision for a tile"""
         if self.destroyed:
             self.solid = False
             self.alpha = 150
         elif self.idx >= 0:
-            if '~' in self.collision:
-                self.solid = True
-                if '_' in self.collision:
-                    self.find_collision()
-            elif '#' in self.collision or '/' in self.collision or '\\' in self.collision or '-' in self.collision \
-                    or '|' in self.collision:
-                self.solid = True
-                if '0' in self.collision or '>' in self.collision or '<' in self.collision:
-                    self.find_collision()
-            elif '<' in self.collision or '>' in self.collision or '_' in self.collision or '=' in self.collision:
-                self.solid = True
+            self.solid = bool(self.flags & SOLID)
+            if self.flags & MEASURED:
                 self.find_collision()
-            else:
-                self.solid = False
         else:
             self.solid = False
 
     def find_collision(self):
         """Finds the block's collision in special occasions"""
-        image = py.transform.scale(self.image, (self.scale * self.img_width, self.scale * self.img_height))
-        self.rect = image.get_rect(topleft=(self.draw_x, self.draw_y))
-        self.mask = py.mask.from_surface(image)
-        rect = self.mask.get_bounding_rects()[0]
-
-        self.col_height = -rect.y if '_' in self.collision else rect.height
-        self.col_width = -rect.x if '>' in self.collision else rect.width
-        if abs(self.col_height) >= 32:
-            self.col_height = 0
-        if abs(self.col_width) >= 32:
-            self.col_width = 0
-
-    def draw(self, win: py.display):
+        self.mask, self.col_width, self.col_height = self.tiles_cls.get_offsets(
+            int(floor(self.idx)), self.flags, (self.scale * self.img_width, self.scale * self.img_height))
+        self.rect = self.mask.get_rect(topleft=(self.draw_x, self.draw_y))
+
+    def draw(self, win: py.display, render=True):
         """Draws Tiles onto Screen"""
         self.tick_bumped()
         if self.idx >= 0:
-            image = self.image if self.dir else self.flipped_img
-            image = py.transform.scale(image, (self.scale * self.img_width, self.scale * self.img_height))
-            image.set_alpha(self.alpha)
-            win.blit(image, (self.draw_x, self.draw_y))
+            if render:
+                self.paint(win, self.draw_x, self.draw_y)
             if self.rect is not None:
                 self.rect.x, self.rect.y = self.draw_x, self.draw_y
 
+    def paint(self, win: py.display, draw_x, draw_y):
+        """Only blits the tile"""
+        image = self.tiles_cls.get_image(int(floor(self.idx)), self.dir, (
+            self.scale * self.img_width, self.scale * self.img_height), self.alpha)
+        win.blit(image, (draw_x, draw_y))
+
     def tick_bumped(self):
         """Animates bumped tiles"""
         if self.bumped is not None:
@@ -119,9 +106,11 @@ class Tiles:
     """Stores tile functions, working with the camera"""
     __slots__ = 'screen', 'sc_width', 'sc_height', 'tile_class', 'tile_size', 'tiles', 'tile_count_x', 'tile_count_y', \
                 'animation_count', 'overlap_tiles', 'overlap_grid', 'destroyed_tiles', 'saved_destroyed_tiles', \
-                'grid_width', 'grid_height', 'camera_x', 'camera_y', 'tile_index', 'grid_list'
+                'grid_width', 'grid_height', 'camera_x', 'camera_y', 'tile_index', 'grid_list', 'bake_chunks', \
+                'chunk_size', 'chunk_margin', 'chunks', 'live_tiles', 'tile_slots', 'overlap_slots', 'chunk_live', \
+                'slot_window'
 
-    def __init__(self, win: py.display, camera_x, camera_y, path="Tile_Arts"):
+    def __init__(self, win: py.display, camera_x, camera_y, path="Tile_Arts", *, bake_chunks=False):
         self.screen = win
         self.sc_width, self.sc_height = win.get_size()
 
@@ -142,16 +131,34 @@ class Tiles:
         self.camera_x = camera_x
         self.camera_y = camera_y
 
+        self.tile_slots = {}  # tile_idx: slot in tiles, kept up to date while tiles loop around the screen
+        self.overlap_slots = {}
         self.tile_index = 0
         self.grid_list = {}  # Dictionaries are 6.6 times faster than lists (both containing 100 items): Reference Below
         """Faster Lookups In Python (2021). Available at: 
         https://towardsdatascience.com/faster-lookups-in-python-1d7503e9cd38 (Accessed: 8 December 2022)."""
 
+        # Baked chunks (on in Level_Loop), static tiles are drawn onto chunk surfaces once instead of every frame
+        self.bake_chunks = bake_chunks
+        self.chunk_size = 16
+        self.chunk_margin = max(ceil(max(tile.img_width, tile.img_height) * tile.scale / self.tile_size) - 1
+                                for tile in self.tile_class.tile.values())  # Big tiles spill into the next chunk
+        self.chunks = {}
+        self.live_tiles = set()  # Tiles being bumped
+        self.chunk_live = {}  # chunk: {tile_idx} of the tiles drawn every frame, see is_live
+        self.slot_window = None  # (column, row) of the bottom left tile the slots are looped around, see loop_slots
+
     def setup(self, grid_size: tuple, setup_dict=None):
         """Sets the tiles onto the screen"""
         self.tiles = {}
         self.overlap_tiles = {}
+        self.tile_slots = {}
+        self.overlap_slots = {}
         self.destroyed_tiles = set(self.saved_destroyed_tiles)
+        self.chunks = {}
+        self.live_tiles = set()
+        self.chunk_live = {}
+        self.slot_window = (0, 0)
         if setup_dict is None:
             self.grid_list = {key: value for key, value in enumerate(
                 [randint(0, 565) for _ in range(0, self.grid_height * self.grid_width)])}
@@ -172,6 +179,7 @@ class Tiles:
                     tile_idx = -1
                 self.overlap_tiles[self.tile_index] = Tile(self.tile_class, self.tiles[-1].x, self.tiles[-1].y,
                                                            tile_idx, self.tile_index)
+                self.tile_slots[self.tile_index] = self.overlap_slots[self.tile_index] = self.tile_index
                 if self.tile_index in self.destroyed_tiles:  # Clearing destroyed tiles
                     self.tiles[self.tile_index].destroyed = True
                     self.tiles[self.tile_index].update_collision()
@@ -182,11 +190,21 @@ class Tiles:
             self.tiles[-1].x += self.tile_size
             self.tile_index += self.grid_height - self.tile_count_y
 
-    def position_tiles(self, editor, move_camera=False):
+    def position_tiles(self, editor, move_camera=False, render=True):
         """Positions the tiles onto the screen (Mainloop for tiles)"""
         self.animation_count += 0.1
         if move_camera:
             self.move_camera()
+        if self.bake_chunks and not editor:
+            # Only the edges of the screen are looped and only the live tiles are drawn on top of the chunks
+            self.loop_slots()
+            if render:
+                self.draw_chunks()
+            self.position_live_tiles(render)
+            return None
+        if self.chunks or self.chunk_live:  # The editor can change any tile
+            self.chunks, self.chunk_live = {}, {}
+        self.slot_window = None  # Tiles are looped one by one
         for i in self.tiles:
             if i < 0:  # Drawer Blocks / Editor Blocks causes issues
                 continue
@@ -203,10 +221,10 @@ class Tiles:
             if tile_idx == 488 or tile_idx == 489:
                 self.tiles[i].idx = round(self.animation_count * 2) % 2 + 488
                 self.tiles[i].update_settings()
-            elif '~' in self.tiles[i].collision:
+            elif self.tiles[i].flags & WATER:
                 self.tiles[i].dir = bool(round(self.animation_count * 0.8) % 2)
 
-            self.tiles[i].draw(self.screen)
+            self.draw_tile(self.tiles[i], render)
         for i in self.overlap_tiles:
             if i < 0:  # Drawer Blocks / Editor Blocks causes issues
                 continue
@@ -223,10 +241,189 @@ class Tiles:
             if tile_idx == 488 or tile_idx == 489:
                 self.overlap_tiles[i].idx = round(self.animation_count * 2) % 2 + 488
                 self.overlap_tiles[i].update_settings()
-            elif '~' in self.overlap_tiles[i].collision:
+            elif self.overlap_tiles[i].flags & WATER:
                 self.overlap_tiles[i].dir = bool(round(self.animation_count * 0.8) % 2)
 
-            self.overlap_tiles[i].draw(self.screen)
+            self.draw_tile(self.overlap_tiles[i], render)
+
+    def position_live_tiles(self, render=True):
+        """Positions, animates and draws the live tiles on screen, the rest are baked into the chunks"""
+        live = self.live_in_window()
+        for tiles, slots in ((self.tiles, self.tile_slots), (self.overlap_tiles, self.overlap_slots)):
+            for tile_idx in live:
+                tile = tiles[slots[tile_idx]]
+                tile.draw_x = tile.x - self.camera_x
+                if tile.bumped is None:
+                    tile.draw_y = tile.y - self.camera_y
+                if tile.idx == 628:
+                    continue
+                # Animating tiles
+                if tile.idx == 488 or tile.idx == 489:
+                    tile.idx = round(self.animation_count * 2) % 2 + 488
+                    tile.update_settings()
+                elif tile.flags & WATER:
+                    tile.dir = bool(round(self.animation_count * 0.8) % 2)
+                self.draw_tile(tile, render)
+
+    def paint_tiles(self, editor, camera_x, camera_y):
+        """Only draws the tiles where they were last positioned, seen from another camera position"""
+        shift_x, shift_y = camera_x - self.camera_x, camera_y - self.camera_y
+        if self.bake_chunks and not editor and self.slot_window is not None:
+            step_camera = self.camera_x, self.camera_y
+            self.camera_x, self.camera_y = camera_x, camera_y
+            self.draw_chunks()
+            self.camera_x, self.camera_y = step_camera
+            live = self.live_in_window()
+            for tiles, slots in ((self.tiles, self.tile_slots), (self.overlap_tiles, self.overlap_slots)):
+                for tile in (tiles[slots[tile_idx]] for tile_idx in live):
+                    if tile.idx >= 0 and tile.idx != 628:
+                        tile.paint(self.screen, tile.draw_x - shift_x, tile.draw_y - shift_y)
+            return None
+        for tiles in (self.tiles, self.overlap_tiles):
+            for i, tile in tiles.items():
+                if i < 0 or tile.idx < 0 or (tile.idx == 628 and not editor):
+                    continue
+                tile.paint(self.screen, tile.draw_x - shift_x, tile.draw_y - shift_y)
+
+    def draw_tile(self, tile, render=True):
+        """Draws a tile, rebaking its chunk once neither of its layers is bumped"""
+        tile.draw(self.screen, render)
+        if tile.bumped is None and tile.tile_idx in self.live_tiles and \
+                self.overlap_tiles[self.overlap_slots[tile.tile_idx]].bumped is None and \
+                self.tiles[self.tile_slots[tile.tile_idx]].bumped is None:
+            self.live_tiles.remove(tile.tile_idx)
+            self.refresh_chunk(tile.tile_idx)
+
+    def is_live(self, tile_idx):
+        """Checks if a tile has to be drawn every frame instead of being baked into its chunk"""
+        if tile_idx in self.destroyed_tiles or tile_idx in self.live_tiles:
+            return True
+        for idx in (self.grid_list.get(tile_idx, -1), self.overlap_grid.get(tile_idx, -1)):
+            if idx < 0:
+                continue
+            tile = self.tile_class.tile[int(floor(idx))]
+            if 488 <= idx < 490 or (tile.flags1 if idx == floor(idx) else tile.flags2) & WATER:
+                return True  # Animated tiles
+        return False
+
+    def get_chunk(self, tile_idx):
+        """Gets the chunk a tile index is in"""
+        return tile_idx // self.grid_height // self.chunk_size, tile_idx % self.grid_height // self.chunk_size
+
+    def refresh_chunk(self, tile_idx):
+        """Rebakes the chunk of a tile after it has changed, and adds it to or takes it out of the live tiles"""
+        chunk = self.get_chunk(tile_idx)
+        self.chunks.pop(chunk, None)
+        if chunk in self.chunk_live:
+            if self.is_live(tile_idx):
+                self.chunk_live[chunk].add(tile_idx)
+            else:
+                self.chunk_live[chunk].discard(tile_idx)
+
+    def get_live(self, chunk) -> set:
+        """The live tiles of a chunk, found the first time the chunk is needed"""
+        if chunk not in self.chunk_live:
+            min_x, min_y = chunk[0] * self.chunk_size, chunk[1] * self.chunk_size
+            self.chunk_live[chunk] = {
+                y + x * self.grid_height for x in range(max(0, min_x), min(self.grid_width, min_x + self.chunk_size))
+                for y in range(max(0, min_y), min(self.grid_height, min_y + self.chunk_size))
+                if self.is_live(y + x * self.grid_height)}
+        return self.chunk_live[chunk]
+
+    def live_in_window(self) -> list:
+        """The live tiles of the chunks the slots are looped around, that are in a slot"""
+        column, row = self.slot_window
+        columns = range(column, column + self.tile_count_x)
+        rows = range(row, row + self.tile_count_y)
+        return [tile_idx for chunk_x in range(column // self.chunk_size, columns[-1] // self.chunk_size + 1)
+                for chunk_y in range(row // self.chunk_size, rows[-1] // self.chunk_size + 1)
+                for tile_idx in self.get_live((chunk_x, chunk_y))
+                if tile_idx // self.grid_height in columns and tile_idx % self.grid_height in rows]
+
+    def bake_chunk(self, chunk):
+        """Draws every static tile of a chunk onto one surface"""
+        size = self.chunk_size * self.tile_size
+        surface = py.Surface((size, size), py.SRCALPHA)
+        min_x, min_y = chunk[0] * self.chunk_size, chunk[1] * self.chunk_size
+        top = (min_y + self.chunk_size - 1) * self.tile_size
+        for grid in (self.grid_list, self.overlap_grid):
+            for x in range(max(0, min_x - self.chunk_margin), min(self.grid_width, min_x + self.chunk_size)):
+                for y in range(max(0, min_y), min(self.grid_height, min_y + self.chunk_size + self.chunk_margin)):
+                    tile_idx = y + x * self.grid_height
+                    idx = grid.get(tile_idx, -1)
+                    if idx < 0 or floor(idx) == 628 or self.is_live(tile_idx):
+                        continue
+                    tile = self.tile_class.tile[int(floor(idx))]
+                    image = self.tile_class.get_image(int(floor(idx)), True, (
+                        tile.scale * tile.img_width, tile.scale * tile.img_height), Tile.get_alpha(int(floor(idx))))
+                    surface.blit(image, ((x - min_x) * self.tile_size, top - y * self.tile_size))
+        self.chunks[chunk] = surface = surface.convert_alpha()  # In the screen's pixel format, blits are faster
+        return surface
+
+    def draw_chunks(self):
+        """Draws the baked chunks around the camera"""
+        size = self.chunk_size * self.tile_size
+        bottom = self.sc_height - self.tile_size  # y position of the bottom row
+        for chunk_x in range(floor(self.camera_x / size), floor((self.camera_x + self.sc_width) / size) + 1):
+            for chunk_y in range(floor((bottom - self.camera_y - self.sc_height) / size),
+                                 floor((bottom - self.camera_y + self.tile_size) / size) + 1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk is None:
+                    chunk = self.bake_chunk((chunk_x, chunk_y))
+                self.screen.blit(chunk, (chunk_x * size - self.camera_x,
+                                         bottom - (chunk_y * self.chunk_size + self.chunk_size - 1) * self.tile_size
+                                         - self.camera_y))
+
+    def loop_slots(self):
+        """Loops the columns and rows of tiles that left the screen to the other side, as check_off_screen does
+        for every tile. Tiles always loop with the rest of their column and row, so only the edges are checked"""
+        if self.slot_window is None:
+            self.slot_window = self.find_slot_window()
+        column, row = self.slot_window
+        count_x, count_y, height = self.tile_count_x, self.tile_count_y, self.grid_height
+
+        def column_x(col):
+            return self.tiles[self.tile_slots[row + col * height]].x - self.camera_x
+
+        def row_y(tile_row):
+            return self.tiles[self.tile_slots[tile_row + column * height]].y - self.camera_y
+
+        moved = 0
+        while moved < count_x and column_x(column + moved) < -self.tile_size:
+            moved += 1
+        if moved:
+            looped, skip, column = range(column, column + moved), count_x, column + moved
+        else:
+            while moved < count_x and column_x(column + count_x - 1 - moved) > self.sc_width:
+                moved += 1
+            looped, skip, column = range(column + count_x - moved, column + count_x), -count_x, column - moved
+        for col in looped:
+            for tile_row in range(row, row + count_y):
+                slot = self.tile_slots[tile_row + col * height]
+                self.loop_tile_x(slot, skip)
+                self.loop_tile_x_overlap(slot, skip)
+
+        moved = 0
+        while moved < count_y and row_y(row + moved) > self.sc_height:
+            moved += 1
+        if moved:
+            looped, skip, row = range(row, row + moved), -count_y, row + moved
+        else:
+            while moved < count_y and row_y(row + count_y - 1 - moved) < -self.tile_size:
+                moved += 1
+            looped, skip, row = range(row + count_y - moved, row + count_y), count_y, row - moved
+        for tile_row in looped:
+            for col in range(column, column + count_x):
+                slot = self.tile_slots[tile_row + col * height]
+                self.loop_tile_y(slot, skip)
+                self.loop_tile_y_overlap(slot, skip)
+        self.slot_window = column, row
+
+    def find_slot_window(self):
+        """Finds the column and row of the bottom left tile from where the tiles are"""
+        tiles = [tile for i, tile in self.tiles.items() if i >= 0]
+        return round(min(tile.x for tile in tiles) / self.tile_size), \
+            round((self.sc_height - self.tile_size - max(tile.y for tile in tiles)) / self.tile_size)
 
     def check_off_screen(self, tile):
         """checks if tile is off_screen"""
@@ -257,6 +454,7 @@ class Tiles:
     def loop_tile_x(self, tile, tile_skip):
         """Makes it possible to scroll in the x-axis"""
         self.tiles[tile].tile_idx += tile_skip * self.grid_height
+        self.index_slot(self.tile_slots, tile, self.tiles[tile].tile_idx, tile_skip * self.grid_height)
         self.tiles[tile].idx = self.grid_list[self.tiles[tile].tile_idx]
         self.tiles[tile].x += tile_skip * self.tile_size
         self.tiles[tile].update_settings()
@@ -265,6 +463,7 @@ class Tiles:
     def loop_tile_y(self, tile, tile_skip):
         """Makes it possible to scroll in the y-axis"""
         self.tiles[tile].tile_idx += -tile_skip
+        self.index_slot(self.tile_slots, tile, self.tiles[tile].tile_idx, -tile_skip)
         self.tiles[tile].idx = self.grid_list[self.tiles[tile].tile_idx]
         self.tiles[tile].y += tile_skip * self.tile_size
         self.tiles[tile].update_settings()
@@ -273,6 +472,7 @@ class Tiles:
     def loop_tile_x_overlap(self, tile, tile_skip):
         """Makes it possible to scroll in the x-axis"""
         self.overlap_tiles[tile].tile_idx += tile_skip * self.grid_height
+        self.index_slot(self.overlap_slots, tile, self.overlap_tiles[tile].tile_idx, tile_skip * self.grid_height)
         if self.overlap_tiles[tile].tile_idx in self.overlap_grid:
             self.overlap_tiles[tile].idx = self.overlap_grid[self.overlap_tiles[tile].tile_idx]
         else:
@@ -284,6 +484,7 @@ class Tiles:
     def loop_tile_y_overlap(self, tile, tile_skip):
         """Makes it possible to scroll in the y-axis"""
         self.overlap_tiles[tile].tile_idx += -tile_skip
+        self.index_slot(self.overlap_slots, tile, self.overlap_tiles[tile].tile_idx, -tile_skip)
         if self.overlap_tiles[tile].tile_idx in self.overlap_grid:
             self.overlap_tiles[tile].idx = self.overlap_grid[self.overlap_tiles[tile].tile_idx]
         else:
@@ -292,6 +493,12 @@ class Tiles:
         self.overlap_tiles[tile].update_settings()
         self.check_destroyed_overlap(tile)
 
+    def index_slot(self, slots, tile, tile_idx, moved):
+        """Moves a looped tile to its new tile index in a slot index"""
+        if slots.get(tile_idx - moved) == tile:
+            del slots[tile_idx - moved]
+        slots[tile_idx] = tile
+
     def check_destroyed(self, tile):
         """Checks if the tile is destroyed or not"""
         if self.tiles[tile].tile_idx in self.destroyed_tiles:
@@ -6,10 +6,12 @@ from tkinter.colorchooser import askcolor
 try:
     from .Level_Tiles.tiles import Tiles, Tile
     from .Level_Store.level_store import Level_Store
+    from .Level_Store.level_grid import Level_Grid
     from .Background.background import Background
 except ImportError:
     from Level_Tiles.tiles import Tiles, Tile
     from Level_Store.level_store import Level_Store
+    from Level_Store.level_grid import Level_Grid
     from Background.background import Background
 
 
@@ -259,7 +261,7 @@ class Level:
     def __init__(self, win: py.display, path):
         self.screen = win
         self.sc_width, self.sc_height = win.get_size()
-        self.tile_grid = {}
+        self.tile_grid = Level_Grid()
         self.grid_width = 0
         self.grid_height = 0
         self.tile_index = -1
@@ -299,7 +301,7 @@ class Level:
     def generate_blank_level(self, grid_dims=None):
         if grid_dims is None:
             grid_dims = (300, 70)
-        self.tile_grid = {}
+        self.tile_grid = Level_Grid()
         self.overlap_grid = {}
         self.entity_grid = {}
         self.grid_width = grid_dims[0]
@@ -588,8 +590,6 @@ class Editor(Level):
                     py.draw.rect(self.screen, self.buttons[button][1], self.buttons[button][0])
 
                 # Drawing the tile
-                self.tile_images[button].image = \
-                    self.tile_images[button].tiles_cls.tile[self.tile_images[button].idx].image
                 self.tile_images[button].draw(self.screen)
             elif button == 0:
                 py.draw.circle(self.tile_images[button][0], self.tile_images[button][1], self.tile_images[button][2],
@@ -692,9 +692,7 @@ class Editor(Level):
             if self.buttons[14][1]:
                 self.buttons[14][1] = '#929291'
         elif button_idx == 15:
-            temp_list = list(self.tile_grid.keys())
-            for idx in temp_list[-self.tiles.grid_height:]:
-                del self.tile_grid[idx]
+            del self.tile_grid[len(self.tile_grid) - self.tiles.grid_height:]
             self.tile_index = len(self.tile_grid) - 1
             self.add_boxed_column()
             self.add_wall_column()
@@ -1286,28 +1284,22 @@ class Editor(Level):
         tile_grid_y = -1 * floor((y - self.sc_height) / 32)  # y level starts at sc_height and decreases
         tile_index = tile_grid_y + tile_grid_x * self.tiles.grid_height
 
-        overlap = True
-        tile = {key: value for key, value in self.tiles.overlap_tiles.items() if value.tile_idx == tile_index
-                and value.idx != -1}
-        if len(tile) < 1:
-            overlap = False
-            tile = {key: value for key, value in self.tiles.tiles.items() if value.tile_idx == tile_index}
-
-        if len(tile) < 1:
-            if y > self.sc_height + 32:
-                self.tiles.tiles[-1].tile_idx = -1
-                self.tiles.tiles[-1].idx = -1
-                self.tiles.tiles[-1].update_settings()
-                return -1, self.tiles.tiles[-1], False
-            self.tiles.tiles[-1].tile_idx = tile_index
-            self.tiles.tiles[-1].idx = self.tiles.grid_list[tile_index]
-            self.tiles.tiles[-1].update_settings()
-            return -1, self.tiles.tiles[-1], True
+        slot = self.tiles.overlap_slots.get(tile_index)
+        if slot is not None and self.tiles.overlap_tiles[slot].idx != -1:
+            return slot, self.tiles.overlap_tiles[slot], True
+        slot = self.tiles.tile_slots.get(tile_index)
+        if slot is not None:
+            return slot, self.tiles.tiles[slot], False
 
-        if overlap:
-            return tuple(tile.keys())[0], self.tiles.overlap_tiles[tuple(tile.keys())[0]], overlap
-        else:
-            return tuple(tile.keys())[0], self.tiles.tiles[tuple(tile.keys())[0]], overlap
+        if y > self.sc_height + 32:
+            self.tiles.tiles[-1].tile_idx = -1
+            self.tiles.tiles[-1].idx = -1
+            self.tiles.tiles[-1].update_settings()
+            return -1, self.tiles.tiles[-1], False
+        self.tiles.tiles[-1].tile_idx = tile_index
+        self.tiles.tiles[-1].idx = self.tiles.grid_list[tile_index]
+        self.tiles.tiles[-1].update_settings()
+        return -1, self.tiles.tiles[-1], True
 
     def get_animation_frames(self, tile) -> int:
         """Gets the animations frames (for entities)"""
@@ -1,108 +1,186 @@
 import pygame as py
+from array import array
 from os import listdir
 from os.path import join, isfile
 
 
+class Particle_Pool:
+    """A fixed number of particles of one type kept in parallel arrays, dead slots go back onto a free list"""
+    __slots__ = 'x', 'y', 'y_vel', 'size', 'image', 'value', 'free', 'active'
+
+    def __init__(self, capacity):
+        self.x = array('d', bytes(8 * capacity))
+        self.y = array('d', bytes(8 * capacity))
+        self.y_vel = array('d', bytes(8 * capacity))
+        self.size = array('d', bytes(8 * capacity))  # Smoke radius or score alpha
+        self.image = [None] * capacity  # Shared surfaces, never changed per particle
+        self.value = [None] * capacity  # Score text
+        self.free = list(range(capacity - 1, -1, -1))
+        self.active = []  # Slots in use, oldest first so they are drawn in the order they were made
+
+    def spawn(self, x, y, y_vel=0.0, size=0.0, image=None, value=None) -> bool:
+        """Takes a free slot, the particle is dropped when the pool is full"""
+        if not self.free:
+            return False
+        i = self.free.pop()
+        self.x[i], self.y[i], self.y_vel[i], self.size[i], self.image[i], self.value[i] = \
+            x, y, y_vel, size, image, value
+        self.active.append(i)
+        return True
+
+    def release(self, dead: set):
+        """Frees the slots of dead particles"""
+        if dead:
+            self.active = [i for i in self.active if i not in dead]
+            for i in dead:
+                self.image[i] = self.value[i] = None
+                self.free.append(i)
+
+    def __len__(self):
+        return len(self.active)
+
+
 class Particles:
     """Stores all particle functions"""
-    __slots__ = 'screen', 'images', 'n_particles', 'particles', 'font', 'lim_particles', 'camera_x', 'camera_y'
+    __slots__ = 'screen', 'images', 'smoke', 'coins', 'scores', 'smoke_images', 'coin_images', 'score_images', 'font', \
+                'lim_particles', 'spawned', 'camera_x', 'camera_y'
+    capacity = {'smoke': 512, 'coins': 64, 'scores': 64}
+    # Particles made in one step and alive at once, past them new ones are dropped. Smoke is dropped first, leaving
+    # room for coins and score popups
+    frame_budget = 48
+    budget = 320
 
     def __init__(self, win: py.display, path=''):
         self.screen = win
         self.images = Particle_Img(path).images
-        self.n_particles = 0
-        self.particles = {}
+        self.smoke = Particle_Pool(self.capacity['smoke'])
+        self.coins = Particle_Pool(self.capacity['coins'])
+        self.scores = Particle_Pool(self.capacity['scores'])
+        self.smoke_images = {}  # radius: smoke circle, py.draw.circle only draws whole pixel radii anyway
+        self.coin_images = {}  # size: scaled coin
+        self.score_images = {}  # (text, alpha): rendered score, there are only a few score values
         self.font = py.font.Font(None, 18)
 
         self.lim_particles = 0
+        self.spawned = 0
         self.camera_x = 0
         self.camera_y = 0
 
-    def mainloop(self):
+    def __len__(self):
+        return len(self.smoke) + len(self.coins) + len(self.scores)
+
+    def mainloop(self, render=True):
         """Runs all particles"""
-        self.delete_particles()
+        self.spawned = 0
         self.position_particles()
-        for particle in self.particles.values():
+        if render:
+            self.paint_particles()
 
-            if particle['type'] == 'coin':
-                self.screen.blit(particle['image'], (particle['draw_x'], particle['draw_y']))
+    def paint_particles(self):
+        """Paints particles before tiles"""
+        coins, camera_x, camera_y = self.coins, self.camera_x, self.camera_y
+        self.screen.blits([(coins.image[i], (coins.x[i] - camera_x, coins.y[i] - camera_y)) for i in coins.active],
+                          False)
 
     def paint_particles_after(self):
         """Paints particles after tiles"""
-        for particle in self.particles.values():
-
-            if particle['type'] == 'smoke':
-                py.draw.circle(self.screen, '#ffffff', (particle['draw_x'], particle['draw_y']), particle['radius'])
-            if particle['type'] == 'score':
-                self.screen.blit(particle['image'], (particle['draw_x'], particle['draw_y']))
-
-    def position_particles(self):
-        """Positions particles onto screen"""
-        new_particles = []
-        for particle in self.particles.values():
-
-            if particle['type'] == 'smoke':
-                particle['radius'] -= 0.1
-
-            elif particle['type'] == 'coin':
-                particle['y_vel'] += 1
-                if particle['y_vel'] > 8:
-                    if particle['show']:
-                        new_particles.append({'score': (particle['x'], particle['y'], 100)})
-                        particle['show'] = False
+        smoke, scores, camera_x, camera_y = self.smoke, self.scores, self.camera_x, self.camera_y
+        smoke_x, smoke_y, radii, images = smoke.x, smoke.y, smoke.size, self.smoke_images
+        blits = []
+        for i in smoke.active:
+            radius = int(radii[i])
+            image = images.get(radius)
+            if image is None:
+                if radius < 1:
                     continue
-                particle['y'] += particle['y_vel']
+                image = self.smoke_image(radius)
+            blits.append((image, (int(smoke_x[i] - camera_x) - radius, int(smoke_y[i] - camera_y) - radius)))
+        blits += [(scores.image[i], (scores.x[i] - camera_x, scores.y[i] - camera_y)) for i in scores.active]
+        self.screen.blits(blits, False)
+
+    def smoke_image(self, radius) -> py.Surface:
+        """Smoke circle of a radius, drawn once"""
+        image = self.smoke_images.get(radius)
+        if image is None:
+            image = py.Surface((radius * 2 + 1, radius * 2 + 1)).convert()
+            image.set_colorkey('#000000')  # Faster to blit than per pixel alpha
+            py.draw.circle(image, '#ffffff', (radius, radius), radius)
+            self.smoke_images[radius] = image
+        return image
 
-            elif particle['type'] == 'score':
-                particle['y_vel'] += 0.1
-                if particle['y_vel'] >= 0:
-                    particle['show'] = False
-                    continue
-                particle['y'] += particle['y_vel']
-                particle['alpha'] = (1 - (1 / (abs(particle['y_vel']) + 1))) * 255
-
-            particle['draw_x'] = particle['x'] - self.camera_x
-            particle['draw_y'] = particle['y'] - self.camera_y
-            if 'alpha' in particle:
-                particle['image'].set_alpha(particle['alpha'])
-
-        for particle in new_particles:
-            key = tuple(particle.keys())[0]
-            if key == 'score':
-                self.tick_score_at(particle[key][0], particle[key][1], particle[key][2])
-
-    def delete_particles(self):
-        """Deletes particles"""
-        for i, particle in tuple(self.particles.items()):  # Copying the dictionary to not get an exception
-
-            if particle['type'] == 'smoke':
-                if particle['radius'] <= 0:
-                    del self.particles[i]
-                    self.n_particles -= 1
-
-            elif particle['type'] == 'coin' or particle['type'] == 'score':
-                if not particle['show']:
-                    del self.particles[i]
-                    self.n_particles -= 1
+    def position_particles(self):
+        """Moves particles, going through the arrays of each particle type once"""
+        smoke, dead = self.smoke, set()
+        radii = smoke.size
+        for i in smoke.active:
+            radii[i] -= 0.1
+            if radii[i] <= 0:
+                dead.add(i)
+        smoke.release(dead)
+
+        coins, dead, landed = self.coins, set(), []
+        coin_y, coin_vel = coins.y, coins.y_vel
+        for i in coins.active:
+            coin_vel[i] += 1
+            if coin_vel[i] > 8:
+                dead.add(i)
+                landed.append((coins.x[i], coin_y[i]))
+                continue
+            coin_y[i] += coin_vel[i]
+        coins.release(dead)
+
+        scores, dead = self.scores, set()
+        score_y, score_vel, alphas = scores.y, scores.y_vel, scores.size
+        for i in scores.active:
+            score_vel[i] += 0.1
+            if score_vel[i] >= 0:
+                dead.add(i)
+                continue
+            score_y[i] += score_vel[i]
+            alphas[i] = (1 - (1 / (abs(score_vel[i]) + 1))) * 255
+            scores.image[i] = self.score_image(scores.value[i], round(alphas[i]))
+        scores.release(dead)
+
+        for x, y in landed:
+            self.tick_score_at(x, y, 100)
+
+    def score_image(self, text, alpha) -> py.Surface:
+        """Score text at an alpha, rendered once"""
+        image = self.score_images.get((text, alpha))
+        if image is None:
+            image = self.score_images.get((text, 255))
+            if image is None:
+                image = self.font.render(text, True, '#434242')
+                self.score_images[(text, 255)] = image
+            if alpha != 255:
+                image = image.copy()
+                image.set_alpha(alpha)
+                self.score_images[(text, alpha)] = image
+        return image
+
+    def in_budget(self, reserve=0) -> bool:
+        """If another particle can be made this step, keeping reserve particles free for more important ones"""
+        if self.spawned >= self.frame_budget or len(self) >= self.budget - reserve:
+            return False
+        self.spawned += 1
+        return True
 
     def tick_smoke_at(self, x, y, size, limit=True):
-        radius = size
-        if self.lim_particles % 2 == 1 or not limit:
-            self.particles[self.n_particles] = {'x': x, 'y': y, 'draw_x': x, 'draw_y': y,
-                                                'radius': radius, 'type': 'smoke'}
-            self.n_particles += 1
+        if (self.lim_particles % 2 == 1 or not limit) and \
+                self.in_budget(self.capacity['coins'] + self.capacity['scores']):
+            self.smoke.spawn(x, y, size=size)
         self.lim_particles += 1
 
     def tick_coin_at(self, x, y, size):
-        self.particles[self.n_particles] = {'x': x, 'y': y, 'draw_x': x, 'draw_y': y, 'y_vel': -8, 'type': 'coin',
-                                            'show': True, 'image': py.transform.scale(self.images[1], (size, size))}
-        self.n_particles += 1
+        image = self.coin_images.get(size)
+        if image is None:
+            image = self.coin_images[size] = py.transform.scale(self.images[1], (size, size))
+        if self.in_budget():
+            self.coins.spawn(x, y, -8, image=image)
 
     def tick_score_at(self, x, y, score):
-        self.particles[self.n_particles] = {'x': x, 'y': y, 'draw_x': x, 'draw_y': y, 'y_vel': -4, 'type': 'score',
-                                            'show': True, 'image': self.font.render(str(score), True, '#434242'),
-                                            'alpha': 255}
-        self.n_particles += 1
+        if self.in_budget():
+            self.scores.spawn(x, y, -4, 255, self.score_image(str(score), 255), str(score))
 
 
 class Particle_Img:
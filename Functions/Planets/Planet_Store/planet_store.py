@@ -1,5 +1,10 @@
 from os.path import join
+from itertools import chain, repeat
 import sqlite3
+import re
+
+# Planet grids are 1_width_height_ then runs of a tile number (empty for nothing) and a length letter
+GRID_TOKENS = re.compile(r'([\d.]*)([^\d.])')
 
 
 class Database:
@@ -131,8 +136,23 @@ class Planet_Store(Database):
                         self.planet[self.planet_name]['overlap'],
                         self.planet[self.planet_name]['level'], self.planet[self.planet_name]['world'])
 
-    def load_planet(self):
-        self.encoded = self.planet[self.planet_name]['grid']
+    def read_grid(self, encoded: str):
+        """Reads the grid width, height and {tile_idx: tile} in one regex pass, runs are repeated in bulk"""
+        tokens = GRID_TOKENS.findall(encoded)
+        if not tokens or tokens[0][0] != '1':
+            return 0, 0, {}
+        grid_width, grid_height = int(tokens[1][0]), int(tokens[2][0])
+        values, letters = zip(*tokens[3:]) if len(tokens) > 3 else ((), ())
+        tiles = {value: float(value or -1) for value in set(values)}
+        cells = list(chain.from_iterable(map(repeat, map(tiles.__getitem__, values),
+                                             map(self.z_to_a.__getitem__, letters))))
+        if len(cells) < grid_width * grid_height:
+            cells += [-2] * (grid_width * grid_height - len(cells))
+        return grid_width, grid_height, dict(enumerate(cells))
+
+    def walk_grid(self, encoded: str):
+        """Reads the grid a letter at a time as planets used to be, kept to check read_grid"""
+        self.encoded = encoded
         self.read_idx = 0
         self.read_value()
         grid_width = 0
@@ -153,6 +173,10 @@ class Planet_Store(Database):
                 for _ in range(self.z_to_a[self.letter]):
                     tile_grid[tile_idx] = float(self.value)
                     tile_idx += 1
+        return grid_width, grid_height, tile_grid
+
+    def load_planet(self):
+        grid_width, grid_height, tile_grid = self.read_grid(self.planet[self.planet_name]['grid'])
         overlaps = {int(o_idx): float(o_tile_idx) for o_idx, o_tile_idx in
                     [o_tile.split(':') for o_tile in self.planet[self.planet_name]['overlap'].split(',')
                      if o_tile != '']}
@@ -181,3 +205,4 @@ class Planet_Store(Database):
                         self.planet[self.planet_name]['overlap'],
                         self.planet[self.planet_name]['level'], self.planet[self.planet_name]['world'])
         self.con.close()
+
@@ -71,7 +71,7 @@ class Tiles:
     """Stores tile functions, working with the camera"""
     __slots__ = 'screen', 'sc_width', 'sc_height', 'tile_class', 'tile_size', 'tiles', 'tile_count_x', 'tile_count_y',\
                 'overlap_tiles', 'overlap_grid', 'level_tiles', 'level_grid', 'grid_width', 'grid_height', 'camera_x', \
-                'camera_y', 'tile_index', 'grid_list', 'animation', 'tiles_animated'
+                'camera_y', 'tile_index', 'grid_list', 'animation', 'tiles_animated', 'tile_slots', 'overlap_slots'
 
     def __init__(self, win: py.display, camera_x, camera_y, path="Tile_Art"):
         self.screen = win
@@ -93,6 +93,8 @@ class Tiles:
         self.camera_x = camera_x
         self.camera_y = camera_y
 
+        self.tile_slots = {}  # tile_idx: slot in tiles, kept up to date while tiles loop around the screen
+        self.overlap_slots = {}
         self.tile_index = 0
         self.grid_list = {}
 
@@ -110,6 +112,7 @@ class Tiles:
             self.grid_list = setup_dict
         self.grid_width, self.grid_height = grid_size[0], grid_size[1]
         self.tiles, self.overlap_tiles, self.level_tiles = {}, {}, {}
+        self.tile_slots, self.overlap_slots = {}, {}
 
         self.tile_index = 0
         self.tiles[-1] = Tile(self.tile_class, 0, 0, 0, -1)
@@ -123,6 +126,7 @@ class Tiles:
                                                            -1, self.tile_index)
                 if self.tile_index in self.overlap_grid:
                     self.overlap_tiles[self.tile_index].idx = self.overlap_grid[self.tile_index]
+                self.tile_slots[self.tile_index] = self.overlap_slots[self.tile_index] = self.tile_index
 
                 self.level_tiles[self.tile_index] = Tile(self.tile_class, self.tiles[-1].x, self.tiles[-1].y,
                                                          -1, self.tile_index)
@@ -228,6 +232,7 @@ class Tiles:
     def loop_tile_x(self, tile, tile_skip):
         """Makes it possible to scroll in the x-axis"""
         self.tiles[tile].tile_idx += tile_skip * self.grid_height
+        self.index_slot(self.tile_slots, tile, self.tiles[tile].tile_idx, tile_skip * self.grid_height)
         if self.tiles[tile].tile_idx in self.grid_list:
             self.tiles[tile].idx = self.grid_list[self.tiles[tile].tile_idx]
         else:
@@ -237,6 +242,7 @@ class Tiles:
     def loop_tile_y(self, tile, tile_skip):
         """Makes it possible to scroll in the y-axis"""
         self.tiles[tile].tile_idx += -tile_skip
+        self.index_slot(self.tile_slots, tile, self.tiles[tile].tile_idx, -tile_skip)
         if self.tiles[tile].tile_idx in self.grid_list:
             self.tiles[tile].idx = self.grid_list[self.tiles[tile].tile_idx]
         else:
@@ -246,6 +252,7 @@ class Tiles:
     def loop_tile_x_overlap(self, tile, tile_skip):
         """Makes it possible to scroll in the x-axis"""
         self.overlap_tiles[tile].tile_idx += tile_skip * self.grid_height
+        self.index_slot(self.overlap_slots, tile, self.overlap_tiles[tile].tile_idx, tile_skip * self.grid_height)
         if self.overlap_tiles[tile].tile_idx in self.overlap_grid:
             self.overlap_tiles[tile].idx = self.overlap_grid[self.overlap_tiles[tile].tile_idx]
         else:
@@ -255,12 +262,19 @@ class Tiles:
     def loop_tile_y_overlap(self, tile, tile_skip):
         """Makes it possible to scroll in the y-axis"""
         self.overlap_tiles[tile].tile_idx += -tile_skip
+        self.index_slot(self.overlap_slots, tile, self.overlap_tiles[tile].tile_idx, -tile_skip)
         if self.overlap_tiles[tile].tile_idx in self.overlap_grid:
             self.overlap_tiles[tile].idx = self.overlap_grid[self.overlap_tiles[tile].tile_idx]
         else:
             self.overlap_tiles[tile].idx = -1
         self.overlap_tiles[tile].y += tile_skip * self.tile_size
 
+    def index_slot(self, slots, tile, tile_idx, moved):
+        """Moves a looped tile to its new tile index in a slot index"""
+        if slots.get(tile_idx - moved) == tile:
+            del slots[tile_idx - moved]
+        slots[tile_idx] = tile
+
     def loop_tile_x_level(self, tile, tile_skip):
         """Makes it possible to scroll in the x-axis"""
         self.level_tiles[tile].tile_idx += tile_skip * self.grid_height
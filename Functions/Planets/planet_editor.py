@@ -848,29 +848,24 @@ class Editor(Planet):
         tile_grid_y = -1 * floor((y - self.sc_height) / 32)  # y level starts at sc_height and decreases
         tile_index = tile_grid_y + tile_grid_x * self.tiles.grid_height
 
-        overlap = True
-        tile = {key: value for key, value in self.tiles.overlap_tiles.items() if value.tile_idx == tile_index
-                and value.idx != -1}
-        if len(tile) < 1:
-            overlap = False
-            tile = {key: value for key, value in self.tiles.tiles.items() if value.tile_idx == tile_index}
-
-        if len(tile) < 1:
-            if y > self.sc_height + 32:
-                self.tiles.tiles[-1].tile_idx = -1
-                self.tiles.tiles[-1].idx = -1
-                return -1, self.tiles.tiles[-1], False
-            if self.overlap_grid[tile_index] != -1:
-                self.tiles.tiles[-1].tile_idx = tile_index
-                self.tiles.tiles[-1].idx = self.tiles.overlap_grid[tile_index]
-                return -1, self.tiles.tiles[-1], False
+        slot = self.tiles.overlap_slots.get(tile_index)
+        if slot is not None and self.tiles.overlap_tiles[slot].idx != -1:
+            return slot, self.tiles.overlap_tiles[slot], True
+        slot = self.tiles.tile_slots.get(tile_index)
+        if slot is not None:
+            return slot, self.tiles.tiles[slot], False
+
+        if y > self.sc_height + 32:
+            self.tiles.tiles[-1].tile_idx = -1
+            self.tiles.tiles[-1].idx = -1
+            return -1, self.tiles.tiles[-1], False
+        if self.overlap_grid[tile_index] != -1:
             self.tiles.tiles[-1].tile_idx = tile_index
-            self.tiles.tiles[-1].idx = self.tiles.grid_list[tile_index]
+            self.tiles.tiles[-1].idx = self.tiles.overlap_grid[tile_index]
             return -1, self.tiles.tiles[-1], False
-        if overlap:
-            return tuple(tile.keys())[0], self.tiles.overlap_tiles[tuple(tile.keys())[0]], overlap
-        else:
-            return tuple(tile.keys())[0], self.tiles.tiles[tuple(tile.keys())[0]], overlap
+        self.tiles.tiles[-1].tile_idx = tile_index
+        self.tiles.tiles[-1].idx = self.tiles.grid_list[tile_index]
+        return -1, self.tiles.tiles[-1], False
 
 
 if __name__ == '__main__':
@@ -6,6 +6,12 @@ try:
     from .Player_Animations.player_animations import Pics_Player
 except ImportError:
     from Player_Animations.player_animations import Pics_Player
+try:
+    from ..Levels.Level_Tiles.Tile_Arts.tile_properties import PASS_LEFT, PASS_RIGHT, SLOPE, SLOPE_CEILING, \
+        SLOPE_FLOOR, PLATFORM, GAP, WATER
+except ImportError:
+    from Levels.Level_Tiles.Tile_Arts.tile_properties import PASS_LEFT, PASS_RIGHT, SLOPE, SLOPE_CEILING, \
+        SLOPE_FLOOR, PLATFORM, GAP, WATER
 
 
 class Player(py.sprite.Sprite):
@@ -699,15 +705,15 @@ class L_Player(Player):
             self.on_ice = True
         elif feet:
             self.on_ice = False
-        if (fix_dx < 0 and tile.collision in '/1 \\0') or (fix_dx > 0 and tile.collision in '\\1 /0'):
+        if (fix_dx < 0 and tile.flags & PASS_LEFT) or (fix_dx > 0 and tile.flags & PASS_RIGHT):
             pass
-        elif '\\' in tile.collision or '/' in tile.collision:
-            m = -1 if '/' in tile.collision else 1  # gradient
-            c = self.tile_size if '/' in tile.collision else 0  # y-intercept
+        elif tile.flags & SLOPE:
+            m = tile.slope  # gradient
+            c = self.tile_size if m < 0 else 0  # y-intercept
             offset_y = mod_y - (m * mod_x + c)  # Linear equation
             if tile.layer == 2:
                 return False
-            if '0' in tile.collision:
+            if tile.flags & SLOPE_CEILING:
                 if offset_y >= 0:
                     return False
                 elif fix_dy > 0:
@@ -715,7 +721,7 @@ class L_Player(Player):
                 else:
                     self.y += self.tile_size - offset_y
                     return True
-            elif '1' in tile.collision:
+            elif tile.flags & SLOPE_FLOOR:
                 if offset_y <= 0:
                     return False
                 elif fix_dy < 0:
@@ -723,10 +729,10 @@ class L_Player(Player):
                 else:
                     self.y -= offset_y
                     return True
-        if '-' in tile.collision:
+        if tile.flags & PLATFORM:
             if mod_y - fix_dy > 1 or not feet or self.climbing:
                 return False
-        if '=' in tile.collision or '_' in tile.collision or '>' in tile.collision or '<' in tile.collision:
+        if tile.flags & GAP:
             dx, dy = tile.col_width, tile.col_height
             if self.y_vel > 21 and dy * -1 > 20:
                 return False
@@ -746,7 +752,7 @@ class L_Player(Player):
                 if mod_x - 5 < dx and -self.x_vel > safe_speed:
                     self.x_vel = -safe_speed
                 return False
-        if '~' in tile.collision:
+        if tile.flags & WATER:
             self.swimming = True
             if 280 <= tile.idx <= 282:
                 self.lives = 0
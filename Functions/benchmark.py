@@ -0,0 +1,378 @@
+import pygame as py
+import os
+import sys
+import json
+from argparse import ArgumentParser
+from glob import glob
+from os.path import join, dirname, abspath, basename, splitext
+from shutil import copy
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+try:
+    from .level_loop import Level_Loop, Player_Interact
+    from .planet_loop import Planet_Loop
+    from .Levels.level_editor import Tiles
+    from .Planets.Tiles.tiles import Tiles as Planet_Tiles
+    from .Player.player import L_Player, P_Player
+    from .Hud.hud import Level_Hud, Planet_Hud
+    from .Particles.particles import Particles
+    from .Levels.Entities.entities import All_Entities
+    from .Levels.Level_Store.level_store import Level_Store
+    from .Planets.Planet_Store.planet_store import Planet_Store
+except ImportError:
+    from level_loop import Level_Loop, Player_Interact
+    from planet_loop import Planet_Loop
+    from Levels.level_editor import Tiles
+    from Planets.Tiles.tiles import Tiles as Planet_Tiles
+    from Player.player import L_Player, P_Player
+    from Hud.hud import Level_Hud, Planet_Hud
+    from Particles.particles import Particles
+    from Levels.Entities.entities import All_Entities
+    from Levels.Level_Store.level_store import Level_Store
+    from Planets.Planet_Store.planet_store import Planet_Store
+
+"""Headless frame time benchmark for the level and planet loops, run with: python Functions/benchmark.py --help
+Recorded key files are JSON lists with one list of key names per frame, e.g. [["right"], ["right", "space"], []]"""
+
+PATH = dirname(abspath(__file__))
+PHASES = 'tiles', 'entities', 'player', 'particles', 'hud'
+# Methods timed for each phase, calls made inside another timed method count towards the outer phase
+LEVEL_PHASES = {'tiles': ((Tiles, 'position_tiles'),),
+                'entities': ((All_Entities, 'move_entity'), (All_Entities, 'draw_entity'),
+                             (All_Entities, 'draw_items')),
+                'player': ((Player_Interact, 'player_mainloop'), (Player_Interact, 'move_player_after_entity'),
+                           (L_Player, 'draw')),
+                'particles': ((Particles, 'mainloop'), (Particles, 'paint_particles_after')),
+                'hud': ((Level_Hud, 'draw'), (Level_Hud, 'run_timer'))}
+# Coin, Slime, Bee, Slime Block, Ray Gun and Key, put into the synthetic level in turn
+SYNTHETIC_ENTITIES = 575, 683, 638, 680, 608, 594
+ENTITY_METHODS = 'move_entity', 'draw_entity', 'draw_items'
+PLANET_PHASES = {'tiles': ((Planet_Tiles, 'position_tiles'),),
+                 'player': ((P_Player, 'move'), (P_Player, 'draw')),
+                 'hud': ((Planet_Hud, 'draw'), (Planet_Loop, 'update_hud'))}
+
+
+class Key_State:
+    """Stands in for the sequence returned by py.key.get_pressed"""
+    __slots__ = 'down'
+
+    def __init__(self, down=frozenset()):
+        self.down = down
+
+    def __getitem__(self, key):
+        return key in self.down
+
+
+class Key_Script:
+    """Feeds a scripted or recorded key sequence to py.key.get_pressed, one entry per frame"""
+    __slots__ = 'frames', 'frame', 'get_pressed'
+
+    def __init__(self, frames=None):
+        self.frames = frames
+        self.frame = 0
+        self.get_pressed = py.key.get_pressed
+
+    @classmethod
+    def from_file(cls, file):
+        """Loads a recorded key sequence"""
+        with open(file) as f:
+            return cls([frozenset(py.key.key_code(name) for name in keys) for keys in json.load(f)])
+
+    @staticmethod
+    def scripted(frame) -> frozenset:
+        """Runs right for most of the time, turning back now and then and jumping every 37 frames"""
+        down = {py.K_RIGHT, py.K_d} if frame % 90 < 70 else {py.K_LEFT, py.K_a}
+        if frame % 37 < 12:
+            down |= {py.K_UP, py.K_w, py.K_SPACE}
+        return frozenset(down)
+
+    def keys(self):
+        if self.frames is None:
+            return Key_State(self.scripted(self.frame))
+        return Key_State(self.frames[self.frame % len(self.frames)])
+
+    def __enter__(self):
+        py.key.get_pressed = self.keys
+        return self
+
+    def __exit__(self, *args):
+        py.key.get_pressed = self.get_pressed
+
+
+class Frame_Timer:
+    """Times whole frames and the phases within them"""
+    __slots__ = 'frame_times', 'phase_times', 'current', 'active', 'patched'
+
+    def __init__(self, phases: dict):
+        self.frame_times = []
+        self.phase_times = {phase: [] for phase in PHASES + ('other',)}
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.active = False
+        self.patched = [(cls, name, cls.__dict__[name]) for methods in phases.values() for cls, name in methods]
+        for phase, methods in phases.items():
+            for cls, name in methods:
+                setattr(cls, name, self.timed(phase, cls.__dict__[name]))
+
+    def timed(self, phase, func):
+        """Wraps a method so the time spent in it counts towards the phase"""
+        def wrapper(*args, **kwargs):
+            if self.active:
+                return func(*args, **kwargs)
+            self.active = True
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.current[phase] += perf_counter() - start
+                self.active = False
+        return wrapper
+
+    def restore(self):
+        """Puts back the original methods"""
+        for cls, name, func in self.patched:
+            setattr(cls, name, func)
+
+    def run_frame(self, mainloop, record=True):
+        """Runs and times one frame"""
+        start = perf_counter()
+        mainloop()
+        py.display.update()
+        total = perf_counter() - start
+        if record:
+            self.frame_times.append(total * 1000)
+            for phase, seconds in self.current.items():
+                self.phase_times[phase].append(seconds * 1000)
+                total -= seconds
+            self.phase_times['other'].append(total * 1000)
+        self.current = dict.fromkeys(PHASES, 0.0)
+
+    def summary(self) -> dict:
+        """Frame time percentiles and mean phase times in milliseconds"""
+        frames = sorted(self.frame_times)
+        return {'frames': len(frames),
+                'frame_ms': {'p50': percentile(frames, 50), 'p95': percentile(frames, 95),
+                             'p99': percentile(frames, 99), 'mean': round(sum(frames) / len(frames), 4),
+                             'max': round(frames[-1], 4)},
+                'phase_ms': {phase: {'mean': round(sum(times) / len(times), 4),
+                                     'p95': percentile(sorted(times), 95)}
+                             for phase, times in self.phase_times.items()}}
+
+
+def copy_planet(planet, data_path) -> str:
+    """Copies the planet database under data_path and returns data_path, opening a planet migrates its database in
+    place so the benchmarks only open the copy"""
+    os.makedirs(join(data_path, 'Data', 'Planets'), exist_ok=True)
+    copy(join(PATH, 'Data', 'Planets', f'{planet}.db'), join(data_path, 'Data', 'Planets'))
+    return data_path
+
+
+def percentile(values, pct) -> float:
+    """Nearest rank percentile of sorted values"""
+    return round(values[max(0, -(-len(values) * pct // 100) - 1)], 4)
+
+
+def bench_level(win, planet, data_path, level, frames, warmup, keys, bake_chunks=True):
+    """Benchmarks Level_Loop.mainloop, restarting the level whenever it is left"""
+    level_loop = Level_Loop(win, py.time.Clock(), PATH)
+    level_loop.tiles.bake_chunks = bake_chunks
+    level_loop.editor.editor_permission = False  # Played as from the title screen, dying restarts the level
+    level_loop.level.level_store.path = data_path
+    level_loop.init_database(planet)
+    timer = Frame_Timer(LEVEL_PHASES)
+    restarts = 0
+    try:
+        level_loop.setup_level(level=level)
+        for frame in range(warmup + frames):
+            keys.frame = frame
+            py.event.pump()
+            timer.run_frame(level_loop.mainloop, frame >= warmup)
+            if level_loop.state != 'run':
+                level_loop.setup_level()
+                level_loop.state = 'run'
+                restarts += 1
+    finally:
+        timer.restore()
+    return dict(timer.summary(), level=level, restarts=restarts)
+
+
+def populate(entities: All_Entities, tiles: Tiles, count) -> int:
+    """Spreads count synthetic entities over the empty tiles of the level, returns how many were added"""
+    free = [y + x * tiles.grid_height for x in range(tiles.grid_width) for y in range(4, tiles.grid_height - 4, 2)
+            if tiles.grid_list[y + x * tiles.grid_height] == -1 and y + x * tiles.grid_height not in entities.entities]
+    step = max(1, len(free) / count)
+    for i in range(min(count, len(free))):
+        entities.add_to_entities(free[int(i * step)], SYNTHETIC_ENTITIES[i % len(SYNTHETIC_ENTITIES)], '0')
+    return min(count, len(free))
+
+
+def bench_entities(win, planet, data_path, level, count, frames, warmup):
+    """Micro benchmark of the entity loop on a synthetic level, the camera sweeps across it instead of the player"""
+    level_loop = Level_Loop(win, py.time.Clock(), PATH)
+    level_loop.level.level_store.path = data_path
+    level_loop.init_database(planet)
+    level_loop.setup_level(level=level)
+    entities, tiles = level_loop.entity, level_loop.tiles
+    added = populate(entities, tiles, count)
+    sweep = max(1, tiles.grid_width * entities.entity_size - entities.sc_width)
+    times = {name: [] for name in ENTITY_METHODS}
+    for frame in range(warmup + frames):
+        distance = frame * entities.entity_size / 4 % (sweep * 2)
+        entities.camera_x = distance if distance < sweep else sweep * 2 - distance
+        for name in ENTITY_METHODS:
+            start = perf_counter()
+            getattr(entities, name)()
+            if frame >= warmup:
+                times[name].append((perf_counter() - start) * 1000)
+    totals = sorted(map(sum, zip(*times.values())))
+    return {'frames': frames, 'entities': len(entities.entities), 'added': added,
+            'frame_ms': {'p50': percentile(totals, 50), 'p95': percentile(totals, 95),
+                         'mean': round(sum(totals) / len(totals), 4)},
+            'method_ms': {name: {'mean': round(sum(t) / len(t), 4), 'p95': percentile(sorted(t), 95)}
+                          for name, t in times.items()}}
+
+
+def bench_particles(win, count, frames, warmup):
+    """Micro benchmark of the particles, about count are asked for by landing smoke, coin bursts every 10 frames and
+    score combos every 60 frames, the particle budget drops some of them"""
+    particles = Particles(win=win, path=join(PATH, 'Particles'))
+    sc_width, sc_height = win.get_size()
+    smoke_size = 10.9375 * 32 / 70  # As made by L_Player
+    times, alive = [], 0
+    for frame in range(warmup + frames):
+        start = perf_counter()
+        for i in range(count // 60):
+            particles.tick_smoke_at(i * 5 % sc_width, sc_height * 0.6, smoke_size, False)
+        if frame % 10 == 0:
+            for i in range(count // 100):
+                particles.tick_coin_at(i * 32 % sc_width, sc_height / 2, 32)
+        if frame % 60 == 0:
+            for i in range(count // 25):  # Many enemies killed at once
+                particles.tick_score_at(i * 16 % sc_width, sc_height / 3, 2 ** (i % 4) * 10 ** (i // 4 % 3 + 2))
+        particles.mainloop()
+        particles.paint_particles_after()
+        if frame >= warmup:
+            times.append((perf_counter() - start) * 1000)
+            alive += len(particles)
+    times.sort()
+    return {'frames': frames, 'particles': count, 'alive': round(alive / frames),
+            'frame_ms': {'p50': percentile(times, 50), 'p95': percentile(times, 95),
+                         'mean': round(sum(times) / len(times), 4)}}
+
+
+def time_ms(repeats, func, *args) -> float:
+    """Mean milliseconds of a call"""
+    start = perf_counter()
+    for _ in range(repeats):
+        func(*args)
+    return round((perf_counter() - start) * 1000 / repeats, 4)
+
+
+def bench_levels(planet, data_path, repeats):
+    """Times decoding every saved level of the planet from the legacy text and the binary format, and reading legacy
+    text grids a letter at a time as before against the one pass readers, levels are converted in memory only"""
+    planet_store = Planet_Store(data_path)
+    planet_store.setup_database(planet)
+    planet_store.setup_planet()
+    encoded = planet_store.planet[planet_store.planet_name]['grid']
+    results = {'planet_grid': {'walk_ms': time_ms(repeats, planet_store.walk_grid, encoded),
+                               'read_ms': time_ms(repeats, planet_store.read_grid, encoded)}, 'levels': {}}
+    levels = results['levels']
+    planet_store.con.close()
+
+    store = Level_Store(data_path)
+    store.setup_database(planet)
+    store.setup_levels()
+    try:
+        for level in store.levels:
+            row = store.get_row(level)
+            if not (row['data'] or row['level']):
+                continue
+            layers = store.read_layers(level)
+            levels[level] = {'size': f'{layers[0]}x{layers[1]}'}
+            for store.binary in (False, True):
+                store.write_layers(level, *layers)
+                name = 'binary' if store.binary else 'legacy'
+                if not store.binary:
+                    levels[level]['walk_grid_ms'] = time_ms(repeats, store.walk_legacy_runs, row['level'])
+                    levels[level]['read_grid_ms'] = time_ms(repeats, store.read_legacy_runs, row['level'])
+                levels[level][f'{name}_ms'] = time_ms(repeats, store.read_layers, level)
+                levels[level][f'{name}_bytes'] = len(row['data'] or '') + len(row['level']) + len(row['overlaps']) + \
+                    len(row['entities'])
+            levels[level]['speedup'] = round(levels[level]['legacy_ms'] / levels[level]['binary_ms'], 1)
+    finally:
+        store.con.close()  # The converted levels are not written back
+    return results
+
+
+def bench_planet(win, planet, data_path, frames, warmup, keys):
+    """Benchmarks Planet_Loop.mainloop on the first save slot"""
+    planet_loop = Planet_Loop(win, py.time.Clock(), PATH)
+    planet_loop.editor.planet_store.path = data_path
+    planet_loop.init_database(planet)
+    planet_loop.setup(0)
+    timer = Frame_Timer(PLANET_PHASES)
+    try:
+        for frame in range(warmup + frames):
+            keys.frame = frame
+            py.event.pump()
+            timer.run_frame(planet_loop.mainloop, frame >= warmup)
+            if planet_loop.state not in ('run', 'cutscene'):
+                planet_loop.state = 'run'
+    finally:
+        timer.restore()
+    return timer.summary()
+
+
+def main(argv=None):
+    planets = sorted(splitext(basename(f))[0] for f in glob(join(PATH, 'Data', 'Planets', '*.db')))
+    parser = ArgumentParser(description='Headless frame time benchmark, prints JSON')
+    parser.add_argument('--planet', default='EARTH;Ian_Au', choices=planets)
+    parser.add_argument('--level', default='1-1')
+    parser.add_argument('--loop', default='both', choices=('level', 'planet', 'both', 'entities', 'particles',
+                                                        'decode'))
+    parser.add_argument('--entities', type=int, default=2000, help='Entities added to the level for --loop entities')
+    parser.add_argument('--particles', type=int, default=500, help='Particles kept alive for --loop particles')
+    parser.add_argument('--repeats', type=int, default=50, help='Decodes of each level for --loop decode')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--warmup', type=int, default=30)
+    parser.add_argument('--per-tile', action='store_true', help='Draw the level tiles one by one instead of from baked '
+                                                                 'chunk surfaces')
+    parser.add_argument('--keys', help='JSON file of recorded key names per frame, scripted keys are used otherwise')
+    parser.add_argument('--out', help='Also write the JSON to this file')
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    py.init()
+    win = py.display.set_mode((768, 480))
+    keys = Key_Script.from_file(args.keys) if args.keys else Key_Script()
+    result = {'planet': args.planet, 'frames': args.frames, 'warmup': args.warmup,
+              'keys': args.keys or 'scripted', 'bake_chunks': not args.per_tile, 'python': sys.version.split()[0],
+              'pygame': py.version.ver}
+    with keys, TemporaryDirectory() as data_path:
+        copy_planet(args.planet, data_path)
+        if args.loop in ('level', 'both'):
+            result['level_loop'] = bench_level(win, args.planet, data_path, args.level, args.frames, args.warmup,
+                                               keys, not args.per_tile)
+        if args.loop in ('planet', 'both'):
+            result['planet_loop'] = bench_planet(win, args.planet, data_path, args.frames, args.warmup, keys)
+        if args.loop == 'entities':
+            result['entity_loop'] = bench_entities(win, args.planet, data_path, args.level, args.entities,
+                                                   args.frames, args.warmup)
+        if args.loop == 'particles':
+            result['particle_loop'] = bench_particles(win, args.particles, args.frames, args.warmup)
+        if args.loop == 'decode':
+            result['level_decode'] = bench_levels(args.planet, data_path, args.repeats)
+    py.quit()
+
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+    return result
+
+
+if __name__ == '__main__':
+    main()
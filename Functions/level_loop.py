@@ -7,12 +7,16 @@ try:
     from .Hud.hud import Level_Hud
     from .Particles.particles import Particles
     from .Levels.Entities.entities import All_Entities
+    from .Levels.Entities.entity_settings import Collidable_Entity
+    from .sim_clock import lerp
 except ImportError:
     from Levels.level_editor import Level, Editor, Tiles
     from Player.player import L_Player
     from Hud.hud import Level_Hud
     from Particles.particles import Particles
     from Levels.Entities.entities import All_Entities
+    from Levels.Entities.entity_settings import Collidable_Entity
+    from sim_clock import lerp
 
 
 class Player_Interact:
@@ -28,7 +32,7 @@ class Player_Interact:
         self.sc_width, self.sc_height = self.win.get_size()
 
         self.tiles = Tiles(win=self.win, camera_x=0, camera_y=0, path=join(path, "Levels", "Level_Tiles",
-                                                                           "Tile_Arts"))
+                                                                           "Tile_Arts"), bake_chunks=True)
         self.editor = Editor(win=self.win, path=path, tiles_cls=self.tiles, editor_exit_func=self.exit_editor,
                              setup_func=self.setup_level, grid_func=self.update_grid)
         self.particles = Particles(win=self.win, path=join(path, "Particles"))
@@ -51,7 +55,7 @@ class Player_Interact:
     def update_grid(self):
         pass
 
-    def player_mainloop(self):
+    def player_mainloop(self, render=True):
         """Mainloop functions for player interaction and movement"""
         if self.editor.editor:
             if self.editor.player_move:
@@ -83,15 +87,17 @@ class Player_Interact:
                 else:
                     self.state = 'exit'
             self.player.update_draw_pos()
-            self.player.draw()
+            if render:
+                self.player.draw()
 
-    def move_player_after_entity(self):
+    def move_player_after_entity(self, render=True):
         """Moves the player after entities are set"""
         if self.player.bounce > 0:
             self.player.bounce -= 1
             self.player.y_vel = -13
             self.player.falling, self.player.jumping = 2, 1
-        self.player.draw()
+        if render:
+            self.player.draw()
 
     def check_around_player(self):
         """Checks around the player"""
@@ -130,6 +136,8 @@ class Player_Interact:
         bumped_tile.idx = 19
         bumped_tile.update_settings()
         bumped_tile.bumped = 180
+        self.tiles.live_tiles.add(bumped_tile.tile_idx)
+        self.tiles.refresh_chunk(bumped_tile.tile_idx)
         if bumped_tile.tile_idx in self.entity.entities:
             self.entity.entities[bumped_tile.tile_idx].spawn_on_mystery()
         else:
@@ -139,14 +147,15 @@ class Player_Interact:
             self.hud.animate_coin_jump()
             self.hud.score += 100
 
-        # Check above for bouncing entity
-        for idx, entity in self.entity.entities.items():
+        # Check above for bouncing entity, only collidable entities can bounce on mystery blocks
+        above = py.Rect(bumped_tile.x, bumped_tile.y - self.tiles.tile_size / 2, self.tiles.tile_size,
+                        self.tiles.tile_size / 2 + 1)
+        for idx, entity in self.entity.query_rect(above, Collidable_Entity).items():
             check_x = bumped_tile.x < entity.x < bumped_tile.x + self.tiles.tile_size or \
                       bumped_tile.x < entity.x + entity.width < bumped_tile.x + self.tiles.tile_size
             if bumped_tile.y - self.tiles.tile_size / 2 < entity.y + entity.height < bumped_tile.y + 1 \
                     and check_x:
-                if hasattr(self.entity.entities[idx], 'pins'):  # Checking if bounce on mystery exists
-                    self.entity.entities[idx].bounce_on_mystery()
+                entity.bounce_on_mystery()
 
     def tick_key_block(self, tile):
         to_collect = {286: 19, 287: 22, 288: 23, 289: 25}
@@ -155,6 +164,7 @@ class Player_Interact:
         if tile[1].tile_idx in self.tiles.destroyed_tiles:
             return None
         self.tiles.destroyed_tiles.add(tile[1].tile_idx)
+        self.tiles.refresh_chunk(tile[1].tile_idx)
         if tile[2]:
             self.tiles.overlap_tiles[tile[0]].destroyed = True
             self.tiles.overlap_tiles[tile[0]].update_collision()
@@ -169,7 +179,7 @@ class Player_Interact:
 
 class Level_Loop(Player_Interact):
     """Class for running a level"""
-    __slots__ = 'in_cam_rect', 'clock', 'fps', 'level', 'current_level'
+    __slots__ = 'in_cam_rect', 'clock', 'fps', 'level', 'current_level', 'prev_camera', 'prev_player'
 
     def __init__(self, win: py.display, tick: py.time, path):
         """Define variables and objects used"""
@@ -178,14 +188,22 @@ class Level_Loop(Player_Interact):
         self.clock, self.fps = tick, 60
         self.level = Level(win=self.win, path=self.path)
         self.current_level = '1-1'
-
-    def mainloop(self, *, draw=True):
-        """Mainloop of Levels"""
-        self.editor.background_cls.draw(self.camera_x, self.camera_y)
-        self.player_mainloop()
+        # Positions before the last simulation step, for drawing in between steps
+        self.prev_camera = 0, 0
+        self.prev_player = 0, 0
+
+    def mainloop(self, *, draw=True, render=True):
+        """Mainloop of Levels, one simulation step that is only drawn if render is set"""
+        render = render or self.editor.editor
+        self.prev_camera = self.camera_x, self.camera_y
+        self.prev_player = self.player.draw_x, self.player.draw_y
+        self.entity.snapshot_positions()
+        if render:
+            self.editor.background_cls.draw(self.camera_x, self.camera_y)
+        self.player_mainloop(render)
         if self.player.lives > 0 and str(self.player.touching) not in 'green red':
             self.entity.move_entity()
-            self.move_player_after_entity()
+            self.move_player_after_entity(render)
             self.move_camera()
             if not self.editor.editor_permission:
                 self.hud.run_timer()
@@ -197,11 +215,11 @@ class Level_Loop(Player_Interact):
                     self.editor.handle_escape()
                 else:
                     self.state = self.player.touching
-        elif self.hud.timer <= 0:
+        elif self.hud.timer <= 0 and render:
             self.hud.display_time_up()
 
         # Drawing Sprites
-        self.paint_mainloop(from_mainloop=True, draw=draw)
+        self.paint_mainloop(from_mainloop=True, draw=draw, render=render)
         if not self.editor.editor:
             keys = py.key.get_pressed()
             if keys[py.K_0]:
@@ -212,24 +230,27 @@ class Level_Loop(Player_Interact):
             py.display.update()
             self.clock.tick(self.fps)
 
-    def paint_mainloop(self, *, from_mainloop=False, draw=True):
-        """Level paint mainloop"""
+    def paint_mainloop(self, *, from_mainloop=False, draw=True, render=True):
+        """Level paint mainloop, when render is off everything still moves but nothing is drawn"""
+        render = render or self.editor.editor
         if not from_mainloop:
             self.editor.background_cls.draw(self.camera_x, self.camera_y)
-        self.particles.mainloop()
-        self.tiles.position_tiles(self.editor.editor)
-        self.particles.paint_particles_after()
-        self.entity.draw_entity()
+        self.particles.mainloop(render)
+        self.tiles.position_tiles(self.editor.editor, render=render)
+        if render:
+            self.particles.paint_particles_after()
+        self.entity.draw_entity(render)
         if self.editor.editor:
             self.entity.draw_items()
         self.editor.editor_mainloop()
 
         if not self.editor.full_screen_menu:
-            self.player.draw()
+            if render:
+                self.player.draw()
             if not self.editor.editor:
-                self.entity.draw_items()
+                self.entity.draw_items(render)
         if not self.editor.editor:
-            self.hud.draw()
+            self.hud.draw(render=render)
         elif self.editor.editor_permission and self.hud.score != 0:
             self.hud.reset_hud()
             self.hud.coins = 0
@@ -255,6 +276,27 @@ class Level_Loop(Player_Interact):
                     self.state = 'run'
                     door_frame = 0
 
+    def render(self, alpha):
+        """Only draws the level, alpha of the way from the previous simulation step to the last one"""
+        limit = self.tiles.tile_size * 4
+        camera_x = lerp(self.prev_camera[0], self.camera_x, alpha, limit)
+        camera_y = lerp(self.prev_camera[1], self.camera_y, alpha, limit)
+        self.editor.background_cls.draw(camera_x, camera_y)
+        if self.hud.timer <= 0 and self.player.lives <= 0:
+            self.hud.display_time_up()
+        self.particles.paint_particles()
+        self.tiles.paint_tiles(self.editor.editor, camera_x, camera_y)
+        self.particles.paint_particles_after()
+        self.entity.paint_entities(alpha, camera_x, camera_y)
+        if not self.editor.full_screen_menu:
+            draw_x, draw_y = self.player.draw_x, self.player.draw_y
+            self.player.draw_x = lerp(self.prev_player[0], draw_x, alpha, limit)
+            self.player.draw_y = lerp(self.prev_player[1], draw_y, alpha, limit)
+            self.player.draw()
+            self.player.draw_x, self.player.draw_y = draw_x, draw_y
+            self.entity.paint_entities(alpha, camera_x, camera_y, items=True)
+        self.hud.draw(tick=False)
+
     def init_database(self, world_name):
         """Initializes database"""
         self.level.setup_database(world_name)
@@ -300,6 +342,7 @@ class Level_Loop(Player_Interact):
         if self.player.lives < 1:
             self.player.lives = 6
             self.hud.lives -= 1
+        self.entity.rng.seed(self.current_level)
         self.entity.init_entities()
         self.adjust_camera()
         # Do a mainloop once to clear any movements
@@ -320,6 +363,7 @@ class Level_Loop(Player_Interact):
         for entity in self.entity.entities:
             self.entity.entities[entity].respawn()
             self.entity.entities[entity].ready_spawn = True
+        self.entity.rebuild_cells()
         self.level.time, self.hud.timer = self.editor.time, self.editor.time
         self.player.lives = 6
 
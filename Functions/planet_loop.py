@@ -20,7 +20,7 @@ class Planet_Loop:
     """Planet loop functions"""
     __slots__ = 'win', 'camera_x', 'camera_y', 'sc_width', 'sc_height', 'clock', 'fps', 'player_number', 'tiles', \
                 'editor', 'hud', 'player', 'all_player_pics', 'temp_progress', 'save_file', 'x_vel', 'y_vel', 'state', \
-                'cutscene_length', 'frame'
+                'cutscene_length', 'frame', 'level_store', 'prefetched'
 
     def __init__(self, win, tick: py.time, path):
         self.win = win
@@ -50,6 +50,10 @@ class Planet_Loop:
         self.cutscene_length = 0
         self.frame = 0
 
+        # Level_Store of the level loop, set by Main so the levels the player can reach next are decoded ahead
+        self.level_store = None
+        self.prefetched = None  # Tile index the levels were last predicted from
+
     def update_save_files(self):
         """Updates save files dictionary"""
         self.save_file = self.temp_progress.get_all_save_data(self.temp_progress.path, self.editor)
@@ -87,6 +91,7 @@ class Planet_Loop:
         self.tiles.grid_list = self.editor.tile_grid
         self.tiles.camera_x, self.tiles.camera_y = 0, 0
         self.tiles.setup((self.editor.grid_width, self.editor.grid_height), self.editor.tile_grid)
+        self.prefetched = None
         if self.editor.editor:
             self.editor.setup_menu()
         if self.editor.levels:
@@ -114,6 +119,7 @@ class Planet_Loop:
         state_dict = {'exit': 'exit', 'green': True, 'red': False}
         self.player.find_spawn_idx(from_level)
         self.editor.in_level = False
+        self.prefetched = None  # New paths may open
         if self.hud.lives < 0.1:
             self.hud.game_overs += 1
             self.hud.lives = 3.6
@@ -151,6 +157,7 @@ class Planet_Loop:
     def mainloop(self):
         """Mainloop for planet"""
         self.move_mainloop()
+        self.prefetch_levels()
         self.r_mainloop()
         if self.state == 'cutscene':
             if self.cutscene_length == 2:
@@ -170,6 +177,20 @@ class Planet_Loop:
         if not self.editor.editor:
             self.player.move(self.state == 'run')
 
+    def prefetch_levels(self):
+        """Predicts the levels the player can enter next, the level stood on and the levels its unlocked paths and
+        secret paths lead to, and has them decoded in the background"""
+        if self.level_store is None or self.editor.editor or self.player.tile_idx == self.prefetched:
+            return
+        self.prefetched = self.player.tile_idx
+        if self.player.tile_idx not in self.editor.levels:
+            return
+        level = self.editor.levels[self.player.tile_idx]
+        reached = self.editor.pathfind.find_all_paths_from(self.player.tile_idx, level.paths + level.secret_paths)
+        self.level_store.prefetch_levels([level.id] + [self.editor.levels[tile_idx].id for tile_idx in sorted(reached)
+                                                       if tile_idx in self.editor.levels and
+                                                       tile_idx in self.editor.progress.paths])
+
     def r_mainloop(self):
         """Mainloop for planet interaction"""
         if __name__ == '__main__':
@@ -0,0 +1,58 @@
+import pygame as py
+
+"""Fixed time step clock, the game logic always steps at the same rate while frames are drawn as fast as allowed"""
+
+
+class Sim_Clock:
+    """Counts how many fixed simulation steps are owed for each drawn frame"""
+    __slots__ = 'clock', 'fps', 'step', 'max_steps', 'uncapped', 'accumulator', 'alpha'
+
+    def __init__(self, clock: py.time.Clock, fps=60, *, max_steps=5, uncapped=False):
+        """Steps are 1 / fps seconds long, at most max_steps are caught up per frame so slow frames don't spiral"""
+        self.clock = clock
+        self.fps = fps
+        self.step = 1000 / fps
+        self.max_steps = max_steps
+        self.uncapped = uncapped
+        self.accumulator = self.step  # The first frame always steps once
+        self.alpha = 0.0
+
+    def tick(self) -> int:
+        """Waits for the next frame, returns the number of simulation steps to run before drawing it"""
+        self.accumulator += self.clock.tick() if self.uncapped else self.clock.tick(self.fps)
+        steps = min(int(self.accumulator // self.step), self.max_steps)
+        self.accumulator = min(self.accumulator - steps * self.step, self.step)  # Time past the cap is dropped
+        self.alpha = self.accumulator / self.step
+        return steps
+
+    def reset(self):
+        """Forgets the time owed by a loading screen, so the next frame steps once instead of catching up"""
+        self.clock.tick()
+        self.accumulator = self.step
+        self.alpha = 0.0
+
+
+def lerp(previous, current, alpha, limit):
+    """Position between two simulation steps, jumps further than limit (teleports, respawns) are not smoothed"""
+    if abs(current - previous) > limit:
+        return current
+    return previous + (current - previous) * alpha
+
+
+if __name__ == '__main__':
+    class Fake_Clock:
+        """Returns preset frame times"""
+        def __init__(self, times):
+            self.times = list(times)
+
+        def tick(self, fps=0):
+            return self.times.pop(0)
+
+    sim = Sim_Clock(Fake_Clock([0, 8, 8, 8, 50, 1000]))
+    assert [sim.tick() for _ in range(6)] == [1, 0, 0, 1, 3, 5]
+    sim = Sim_Clock(Fake_Clock([16, 2000, 16]))
+    sim.tick()
+    sim.reset()  # The 2000 ms loading screen is not caught up
+    assert sim.tick() == 1
+    assert lerp(0, 10, 0.5, 32) == 5 and lerp(0, 100, 0.5, 32) == 100
+    print('ok')
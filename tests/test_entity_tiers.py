@@ -0,0 +1,97 @@
+import os
+import sys
+import unittest
+from os.path import dirname, join
+from shutil import copy
+from tempfile import TemporaryDirectory
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+FUNCTIONS = join(dirname(dirname(__file__)), 'Functions')
+sys.path.insert(0, FUNCTIONS)
+import pygame as py  # noqa: E402
+from level_loop import Level_Loop  # noqa: E402
+from Levels.Entities.entity_settings import Entity, Movable_Tile  # noqa: E402
+
+"""Far away global entities run at the tier of their class, see Entity.far_tier"""
+
+PLANET = 'EARTH;Ian_Au'
+LEVEL = '4-1'  # Has moving platforms far from the spawn
+FRAMES = 240
+data_path = None
+level_loop = None
+image_load = py.image.load
+
+
+def setUpModule():
+    global data_path, level_loop
+    py.init()
+    win = py.display.set_mode((768, 480))
+    # Some images are loaded with Windows path separators
+    py.image.load = lambda file, *args: image_load(file.replace('\\', '/') if isinstance(file, str) else file, *args)
+    # Opening a planet migrates its database in place, so only a copy is opened
+    data_path = TemporaryDirectory()
+    os.makedirs(join(data_path.name, 'Data', 'Planets'))
+    copy(join(FUNCTIONS, 'Data', 'Planets', f'{PLANET}.db'), join(data_path.name, 'Data', 'Planets'))
+    level_loop = Level_Loop(win, py.time.Clock(), FUNCTIONS)
+    level_loop.level.level_store.path = data_path.name
+    level_loop.init_database(PLANET)
+
+
+def tearDownModule():
+    level_loop.level.level_store.close()
+    data_path.cleanup()
+    py.image.load = image_load
+    py.quit()
+
+
+def run_level(tier, frames=FRAMES) -> dict:
+    """Plays the level with movable tiles at the tier, catches the coarse ones up and returns their positions"""
+    Movable_Tile.far_tier = tier
+    try:
+        level_loop.setup_level(level=LEVEL)
+        for _ in range(frames):
+            level_loop.mainloop()
+        entities = level_loop.entity
+        for tile_idx, behind in entities.coarse_entities.items():
+            if behind:
+                entities.refresh(tile_idx)
+                entities.entities[tile_idx].coarse_tick(behind)
+        far = set(entities.coarse_entities) if tier != 'dormant' else {
+            tile_idx for tile_idx, entity in entities.registries['movable_tiles'].items()
+            if id(entity) in entities.global_entities and tile_idx not in entities.running_entities}
+        return {tile_idx: (entity.x, entity.y, tile_idx in far)
+                for tile_idx, entity in entities.registries['movable_tiles'].items()}
+    finally:
+        Movable_Tile.far_tier = 'coarse'
+
+
+class Test_Far_Tiers(unittest.TestCase):
+
+    def test_coarse_matches_full(self):
+        full, coarse = run_level('full'), run_level('coarse')
+        start = run_level('full', 0)
+        moved = [tile_idx for tile_idx, (x, y, far) in coarse.items() if far and (x, y) != start[tile_idx][:2]]
+        self.assertTrue(moved)  # Far tiles ran coarse and moved
+        self.assertEqual({tile_idx: pos[:2] for tile_idx, pos in full.items()},
+                         {tile_idx: pos[:2] for tile_idx, pos in coarse.items()})
+
+    def test_dormant_stays_frozen(self):
+        start, dormant = run_level('dormant', 0), run_level('dormant')
+        far = [tile_idx for tile_idx, (x, y, is_far) in dormant.items() if is_far]
+        self.assertTrue(far)
+        self.assertEqual([dormant[tile_idx][:2] for tile_idx in far], [start[tile_idx][:2] for tile_idx in far])
+
+    def test_default_coarse_tick_runs_every_frame(self):
+        class Counter:
+            ticks = 0
+
+            def mainloop(self):
+                self.ticks += 1
+        counter = Counter()
+        Entity.coarse_tick(counter, 5)
+        self.assertEqual(counter.ticks, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import sys
+import unittest
+import zlib
+from array import array
+from glob import glob
+from os import makedirs
+from os.path import basename, dirname, join, splitext
+from shutil import copy
+from sys import byteorder
+from tempfile import TemporaryDirectory
+
+FUNCTIONS = join(dirname(dirname(__file__)), 'Functions')
+sys.path.insert(0, FUNCTIONS)
+from Levels.Level_Store import level_codec as codec  # noqa: E402
+from Levels.Level_Store.level_grid import Level_Grid  # noqa: E402
+from Levels.Level_Store.level_store import Level_Store  # noqa: E402
+
+"""The binary level format, see level_codec.py"""
+
+PLANETS = sorted(splitext(basename(file))[0] for file in glob(join(FUNCTIONS, 'Data', 'Planets', '*.db')))
+VARINTS = [0, 1, 0x7f, 0x80, 0xff, 0x3fff, 0x4000, 0x1fffff, 0x200000, 2 ** 32 - 1, 2 ** 32, 2 ** 63, 2 ** 70]
+
+
+def level(compress=True, overlaps=None, entities=None):
+    """A 300 x 70 level of ground, air and one half tile"""
+    grid = Level_Grid.from_runs(((28.0, 300), (-1.0, 20000), (19.5, 700)), 21000)
+    return grid, codec.encode_level(300, 70, grid, {5: 3.0, 2: 4.5} if overlaps is None else overlaps,
+                                    {20999: 575.0, 0: 683.0, 70: 575.0} if entities is None else entities,
+                                    compress=compress)
+
+
+def body(data) -> bytes:
+    return zlib.decompress(data[5:]) if data[4] & codec.ZLIB else data[5:]
+
+
+class Test_Varints(unittest.TestCase):
+
+    def test_write_varint(self):
+        self.assertEqual(bytes(self.write(0)), b'\x00')
+        self.assertEqual(bytes(self.write(0x7f)), b'\x7f')
+        self.assertEqual(bytes(self.write(0x80)), b'\x80\x01')
+        self.assertEqual(bytes(self.write(0x3fff)), b'\xff\x7f')
+        self.assertEqual(bytes(self.write(0x4000)), b'\x80\x80\x01')
+
+    def test_read_varints(self):
+        data = bytearray()
+        for value in VARINTS:
+            codec.write_varint(data, value)
+        self.assertEqual(codec.read_varints(bytes(data), 0), VARINTS)
+
+    def test_read_varints_from_start(self):
+        data = b'\xff\xff' + bytes(self.write(0x80)) + bytes(self.write(5)) + bytes(self.write(2 ** 40))
+        self.assertEqual(codec.read_varints(data, 2), [0x80, 5, 2 ** 40])
+        self.assertEqual(codec.read_varints(data, len(data)), [])
+
+    def test_zigzag(self):
+        self.assertEqual([codec.zigzag(value) for value in (0, -1, 1, -2, 2)], [0, 1, 2, 3, 4])
+        for value in (0, 1, -1, 63, -64, 64, -65, 2 ** 31, -2 ** 31, 2 ** 62, -2 ** 62 - 1):
+            with self.subTest(value=value):
+                self.assertGreaterEqual(codec.zigzag(value), 0)
+                self.assertEqual(codec.unzigzag(codec.zigzag(value)), value)
+
+    @staticmethod
+    def write(value) -> bytearray:
+        data = bytearray()
+        codec.write_varint(data, value)
+        return data
+
+
+class Test_Level_Codec(unittest.TestCase):
+
+    def test_header(self):
+        _, data = level()
+        self.assertEqual(data[:3], codec.MAGIC)
+        self.assertEqual(data[3], codec.VERSION)
+        self.assertTrue(codec.is_binary(data))
+        self.assertFalse(codec.is_binary('1_300_70_28j'))
+        self.assertFalse(codec.is_binary(b'1_300_70_28j'))
+        self.assertFalse(codec.is_binary(None))
+
+    def test_unknown_version(self):
+        _, data = level()
+        with self.assertRaises(ValueError):
+            codec.decode_level(data[:3] + bytes((codec.VERSION + 1,)) + data[4:])
+
+    def test_not_binary(self):
+        for data in (b'1_300_70_28j', '1_300_70_28j', b''):
+            with self.subTest(data=data), self.assertRaises(ValueError):
+                codec.decode_level(data)
+
+    def test_round_trip(self):
+        grid, data = level()
+        width, height, tiles, overlaps, entities = codec.decode_level(data)
+        self.assertEqual((width, height), (300, 70))
+        self.assertEqual(tiles.cells, grid.cells)
+        # Layers keep their order, so their tile index deltas can go backwards
+        self.assertEqual(list(overlaps.items()), [(5, 3.0), (2, 4.5)])
+        self.assertEqual(list(entities.items()), [(20999, 575.0), (0, 683.0), (70, 575.0)])
+
+    def test_palette(self):
+        _, data = level(compress=False, entities={20999: 575.0, 0: 683.0, 70: 575.0, 71: 28.0})
+        data = body(data)
+        # Grid tiles first, then the layer tiles that are not in the grid, each value once
+        self.assertEqual(data[:4], b'\xac\x02\x46\x07')  # 300, 70, 7
+        palette = array('d', data[4:4 + 7 * 8])
+        if byteorder == 'big':
+            palette.byteswap()
+        self.assertEqual(list(palette), [28.0, -1.0, 19.5, 3.0, 4.5, 575.0, 683.0])
+        values = codec.read_varints(data, 4 + 7 * 8)
+        self.assertEqual(values[:7], [3, 0, 300, 1, 20000, 2, 700])  # Runs of palette indexes
+        # Counts, then (zigzag tile index delta, palette index) pairs
+        self.assertEqual(values[7:], [2, 10, 3, 5, 4, 4, 41998, 5, 41997, 6, 140, 5, 2, 0])
+
+    def test_zlib(self):
+        grid, packed = level()
+        _, plain = level(compress=False)
+        self.assertEqual(packed[4], codec.ZLIB)
+        self.assertEqual(plain[4], 0)
+        self.assertLess(len(packed), len(plain))
+        self.assertEqual(body(packed), plain[5:])
+        for data in (packed, plain):
+            self.assertEqual(codec.decode_level(data)[2].cells, grid.cells)
+
+    def test_zlib_only_when_smaller(self):
+        grid = Level_Grid.from_runs(((28.0, 1),), 1)
+        data = codec.encode_level(1, 1, grid, {}, {})
+        self.assertEqual(data[4], 0)
+        self.assertEqual(codec.decode_level(data)[2].cells, grid.cells)
+
+    def test_empty_layers(self):
+        grid, data = level(overlaps={}, entities={})
+        _, _, tiles, overlaps, entities = codec.decode_level(data)
+        self.assertEqual((tiles.cells, overlaps, entities), (grid.cells, {}, {}))
+
+    def test_short_grid(self):
+        """Tiles missing from the end of the runs are empty"""
+        data = codec.encode_level(5, 4, Level_Grid.from_runs(((28.0, 10), (-2.0, 10)), 20), {}, {}, compress=False)
+        self.assertEqual(data[-7:], b'\x02\x00\x0a\x01\x0a\x00\x00')  # 2 runs, then the empty layers
+        short = data[:-7] + b'\x01\x00\x0a\x00\x00'  # Only the first run
+        self.assertEqual(list(codec.decode_level(short)[2].cells), [28.0] * 10 + [-2.0] * 10)
+
+
+class Test_Shipped_Levels(unittest.TestCase):
+
+    def test_round_trip(self):
+        with TemporaryDirectory() as path:
+            # Opening a planet migrates its database in place, so only copies are opened
+            makedirs(join(path, 'Data', 'Planets'))
+            for planet in PLANETS:
+                copy(join(FUNCTIONS, 'Data', 'Planets', f'{planet}.db'), join(path, 'Data', 'Planets'))
+                store = Level_Store(path)
+                store.setup_database(planet)
+                store.setup_levels()
+                for level_id in store.levels:
+                    layers = store.read_layers(level_id)
+                    if not layers[0]:
+                        continue
+                    for compress in (True, False):
+                        with self.subTest(planet=planet, level=level_id, compress=compress):
+                            decoded = codec.decode_level(codec.encode_level(*layers, compress=compress))
+                            self.assertEqual(decoded[:2], layers[:2])
+                            self.assertEqual(decoded[2].cells, layers[2].cells)
+                            self.assertEqual([list(layer.items()) for layer in decoded[3:]],
+                                             [list(layer.items()) for layer in layers[3:]])
+                store.con.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
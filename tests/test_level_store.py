@@ -0,0 +1,143 @@
+import sys
+import unittest
+from glob import glob
+from os import makedirs
+from os.path import basename, dirname, join, splitext
+from shutil import copy
+from tempfile import TemporaryDirectory
+
+FUNCTIONS = join(dirname(dirname(__file__)), 'Functions')
+sys.path.insert(0, FUNCTIONS)
+from Levels.Level_Store.level_codec import decode_level, encode_level  # noqa: E402
+from Levels.Level_Store.level_grid import Level_Grid  # noqa: E402
+from Levels.Level_Store.level_store import Level_Store, read_legacy_layer  # noqa: E402
+from Planets.Planet_Store.planet_store import Planet_Store  # noqa: E402
+
+"""The fast level and planet readers against the letter by letter readers they replaced, and the binary format
+against the legacy one, for every shipped planet"""
+
+PLANETS = sorted(splitext(basename(file))[0] for file in glob(join(FUNCTIONS, 'Data', 'Planets', '*.db')))
+data_path = None
+
+
+def copy_planets() -> TemporaryDirectory:
+    """Opening a planet migrates its database in place, so only copies are opened"""
+    path = TemporaryDirectory()
+    makedirs(join(path.name, 'Data', 'Planets'))
+    for planet in PLANETS:
+        copy(join(FUNCTIONS, 'Data', 'Planets', f'{planet}.db'), join(path.name, 'Data', 'Planets'))
+    return path
+
+
+def setUpModule():
+    global data_path
+    data_path = copy_planets()
+
+
+def tearDownModule():
+    data_path.cleanup()
+
+
+def open_levels(planet, path=None) -> Level_Store:
+    store = Level_Store(path or data_path.name)
+    store.setup_database(planet)
+    store.setup_levels()
+    return store
+
+
+def legacy_rows(store):
+    """The levels saved in the legacy text format"""
+    for level in store.levels:
+        row = store.get_row(level)
+        if row['level'] and not row['data']:
+            yield level, row
+
+
+class Test_Level_Store(unittest.TestCase):
+
+    def test_shipped_planets(self):
+        self.assertTrue(PLANETS)
+
+    def test_read_legacy_runs(self):
+        for planet in PLANETS:
+            store = open_levels(planet)
+            for level, row in legacy_rows(store):
+                with self.subTest(planet=planet, level=level):
+                    self.assertEqual(store.read_legacy_runs(row['level']), store.walk_legacy_runs(row['level']))
+            store.con.close()
+
+    def test_read_legacy_layer(self):
+        for planet in PLANETS:
+            store = open_levels(planet)
+            for level, row in legacy_rows(store):
+                for name in ('overlaps', 'entities'):
+                    with self.subTest(planet=planet, level=level, layer=name):
+                        layer = {int(tile_idx): float(tile) for tile_idx, tile in
+                                 [pair.split(':') for pair in row[name].split(',') if pair != '']}
+                        self.assertEqual(list(read_legacy_layer(row[name]).items()), list(layer.items()))
+            store.con.close()
+
+    def test_binary_round_trip(self):
+        for planet in PLANETS:
+            store = open_levels(planet)
+            for level, row in legacy_rows(store):
+                with self.subTest(planet=planet, level=level):
+                    width, height, runs = store.walk_legacy_runs(row['level'])
+                    layers = store.read_layers(level)
+                    binary = decode_level(encode_level(*layers))
+                    self.assertEqual(binary[:2], (width, height))
+                    self.assertEqual(layers[:2], (width, height))
+                    self.assertEqual(binary[2].cells, Level_Grid.from_runs(runs, width * height).cells)
+                    self.assertEqual(layers[2].cells, binary[2].cells)
+                    self.assertEqual([list(layer.items()) for layer in binary[3:]],
+                                     [list(layer.items()) for layer in layers[3:]])
+            store.con.close()
+
+    def test_convert_levels(self):
+        with copy_planets() as path:  # Converting rewrites the levels the other tests read
+            for planet in PLANETS:
+                with self.subTest(planet=planet):
+                    self.check_conversion(planet, path)
+
+    def check_conversion(self, planet, path):
+        """Converts a planet to the binary format and back, its levels read the same every time"""
+        store = open_levels(planet, path)
+        legacy = {level: store.read_layers(level) for level, _ in legacy_rows(store)}
+        self.assertEqual(store.convert_levels(), len(legacy))
+        store.close()
+        store = open_levels(planet, path)
+        self.assertEqual(store.binary, bool(legacy))
+        for level, layers in legacy.items():
+            binary = store.read_layers(level)
+            self.assertEqual(binary[:2], layers[:2])
+            self.assertEqual(binary[2].cells, layers[2].cells)
+            self.assertEqual([list(layer.items()) for layer in binary[3:]],
+                             [list(layer.items()) for layer in layers[3:]])
+        self.assertEqual(store.convert_levels(binary=False), len(legacy))
+        store.close()
+        store = open_levels(planet, path)
+        self.assertFalse(store.binary)
+        for level, layers in legacy.items():
+            self.assertEqual(store.read_layers(level)[2].cells, layers[2].cells)
+        store.con.close()
+
+
+class Test_Planet_Store(unittest.TestCase):
+
+    def test_read_grid(self):
+        for planet in PLANETS:
+            with self.subTest(planet=planet):
+                store = Planet_Store(data_path.name)
+                store.setup_database(planet)
+                store.setup_planet()
+                encoded = store.planet[store.planet_name]['grid']
+                width, height, grid = store.read_grid(encoded)
+                old_width, old_height, old_grid = store.walk_grid(encoded)
+                self.assertEqual((width, height), (old_width, old_height))
+                self.assertEqual(list(grid.items()), list(old_grid.items()))
+                self.assertEqual([type(tile) for tile in grid.values()], [type(tile) for tile in old_grid.values()])
+                store.con.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import sys
+import unittest
+from os.path import dirname, join
+
+sys.path.insert(0, join(dirname(dirname(__file__)), 'Functions'))
+from Levels.Level_Tiles.Tile_Arts import tile_properties as tp  # noqa: E402
+from Levels.Level_Tiles.Tile_Arts import tile_settings as ts  # noqa: E402
+
+"""Collision flags against the collision string checks they replaced, copied from the baseline Tile, L_Player,
+Collidable_Entity and Tiles code"""
+
+
+def baseline_update_collision(collision):
+    """Tile.update_collision for a placed tile, returns (solid, find_collision called)"""
+    found = False
+    if '~' in collision:
+        solid = True
+        if '_' in collision:
+            found = True
+    elif '#' in collision or '/' in collision or '\\' in collision or '-' in collision \
+            or '|' in collision:
+        solid = True
+        if '0' in collision or '>' in collision or '<' in collision:
+            found = True
+    elif '<' in collision or '>' in collision or '_' in collision or '=' in collision:
+        solid = True
+        found = True
+    else:
+        solid = False
+    return solid, found
+
+
+def baseline_find_collision(collision):
+    """Tile.find_collision, returns whether col_height and col_width are measured from the top and left"""
+    return '_' in collision, '>' in collision
+
+
+def baseline_move_outside_collision(collision):
+    """String checks of L_Player.move_outside_collision and Collidable_Entity.move_outside_collision"""
+    checks = {'pass_left': collision in '/1 \\0', 'pass_right': collision in '\\1 /0',
+              'slope': '\\' in collision or '/' in collision, 'ceiling': '0' in collision,
+              'floor': '1' in collision, 'platform': '-' in collision, 'water': '~' in collision,
+              'gap': '=' in collision or '_' in collision or '>' in collision or '<' in collision}
+    if '\\' in collision or '/' in collision:
+        checks['m'] = -1 if '/' in collision else 1  # gradient
+        checks['c'] = 32 if '/' in collision else 0  # y-intercept
+    return checks
+
+
+def flag_move_outside_collision(flags, slope):
+    """Flag checks that replaced baseline_move_outside_collision"""
+    checks = {'pass_left': bool(flags & tp.PASS_LEFT), 'pass_right': bool(flags & tp.PASS_RIGHT),
+              'slope': bool(flags & tp.SLOPE), 'ceiling': bool(flags & tp.SLOPE_CEILING),
+              'floor': bool(flags & tp.SLOPE_FLOOR), 'platform': bool(flags & tp.PLATFORM),
+              'water': bool(flags & tp.WATER), 'gap': bool(flags & tp.GAP)}
+    if flags & tp.SLOPE:
+        checks['m'] = slope
+        checks['c'] = 32 if slope < 0 else 0
+    return checks
+
+
+class Test_Collision_Flags(unittest.TestCase):
+    """Every tile index and layer gives the same answers from its flags as from its collision string"""
+
+    def layers(self):
+        for index in ts.tile_settings:
+            tile = tp.Tile_Index_Properties(False, index)
+            yield index, tile.collision1, tile.flags1, tile.slope1
+            yield index + 0.5, tile.collision2, tile.flags2, tile.slope2
+
+    def test_update_collision(self):
+        for index, collision, flags, slope in self.layers():
+            with self.subTest(index=index, collision=collision):
+                self.assertEqual(baseline_update_collision(collision),
+                                 (bool(flags & tp.SOLID), bool(flags & tp.MEASURED)))
+
+    def test_find_collision(self):
+        for index, collision, flags, slope in self.layers():
+            with self.subTest(index=index, collision=collision):
+                self.assertEqual(baseline_find_collision(collision),
+                                 (bool(flags & tp.GAP_TOP), bool(flags & tp.GAP_LEFT)))
+
+    def test_move_outside_collision(self):
+        for index, collision, flags, slope in self.layers():
+            with self.subTest(index=index, collision=collision):
+                self.assertEqual(baseline_move_outside_collision(collision), flag_move_outside_collision(flags, slope))
+
+    def test_animated_water(self):
+        for index, collision, flags, slope in self.layers():
+            with self.subTest(index=index, collision=collision):
+                self.assertEqual('~' in collision, bool(flags & tp.WATER))
+
+
+if __name__ == '__main__':
+    unittest.main()